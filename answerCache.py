@@ -0,0 +1,170 @@
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict, defaultdict
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 4
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+# Function to normalise a question so trivial differences (case, punctuation, spacing) hit the same entry
+def normalise_question(question):
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+
+# Function to pull out the numbers and identifiers ("2030", "4.25%", "459200AB7") a near hit must match exactly
+def identifier_tokens(question):
+    return sorted(token for token in question.split() if any(ch.isdigit() for ch in token))
+
+
+def context_hash(context):
+    return hashlib.sha256((context or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _shingles(text):
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+# Fixed (seeded) permutations so signatures are comparable across the process lifetime
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.sha256(f"a{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME or 1,
+     int.from_bytes(hashlib.sha256(f"b{i}".encode()).digest()[:8], "big") % _MERSENNE_PRIME)
+    for i in range(NUM_PERMUTATIONS)
+]
+
+
+# Function to compute the MinHash signature of a normalised question
+def minhash(text):
+    hashes = [_hash(shingle) for shingle in _shingles(text)]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(signature, other):
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+def _bands(signature):
+    return [(band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]) for band in range(BANDS)]
+
+
+# Process-wide cache of chat answers with exact and near-duplicate lookup, TTL and LRU eviction
+class AnswerCache:
+    def __init__(self, max_entries=1000, ttl_seconds=24 * 3600, similarity_threshold=0.8):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.buckets = defaultdict(set)
+        self.lock = threading.Lock()
+        self.counters = {"exact_hits": 0, "near_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _key(self, question, context):
+        return (context_hash(context), normalise_question(question))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        for band in _bands(entry["signature"]):
+            self.buckets[(key[0], band)].discard(key)
+
+    def _expired(self, entry):
+        return time.time() - entry["created"] > self.ttl_seconds
+
+    def get(self, question, context=""):
+        key = self._key(question, context)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._remove(key)
+                self.counters["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.counters["exact_hits"] += 1
+                return entry["answer"]
+
+            # Near-duplicate lookup: candidates share at least one LSH band, then check the estimated similarity
+            signature = minhash(key[1])
+            candidates = set()
+            for band in _bands(signature):
+                candidates |= self.buckets.get((key[0], band), set())
+            best_key, best_score = None, 0.0
+            identifiers = identifier_tokens(key[1])
+            for candidate in candidates:
+                # Questions differing only in a year, rate or CUSIP look alike but have different answers
+                if identifier_tokens(candidate[1]) != identifiers:
+                    continue
+                score = similarity(signature, self.entries[candidate]["signature"])
+                if score > best_score:
+                    best_key, best_score = candidate, score
+            if best_key is not None and best_score >= self.similarity_threshold:
+                entry = self.entries[best_key]
+                if self._expired(entry):
+                    self._remove(best_key)
+                    self.counters["expirations"] += 1
+                else:
+                    self.entries.move_to_end(best_key)
+                    self.counters["near_hits"] += 1
+                    return entry["answer"]
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, question, answer, context=""):
+        key = self._key(question, context)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            signature = minhash(key[1])
+            self.entries[key] = {"answer": answer, "created": time.time(), "signature": signature}
+            for band in _bands(signature):
+                self.buckets[(key[0], band)].add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+            metrics["entries"] = len(self.entries)
+        lookups = metrics["exact_hits"] + metrics["near_hits"] + metrics["misses"]
+        metrics["hit_rate"] = round((metrics["exact_hits"] + metrics["near_hits"]) / lookups, 3) if lookups else 0.0
+        return metrics
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+# Function to return the answer cache shared by every session in this process
+def get_answer_cache():
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache(
+                max_entries=int(os.environ.get("CA_ANSWER_CACHE_ENTRIES", "1000")),
+                ttl_seconds=float(os.environ.get("CA_ANSWER_CACHE_TTL", str(24 * 3600))),
+                similarity_threshold=float(os.environ.get("CA_ANSWER_CACHE_SIMILARITY", "0.8")),
+            )
+        return _answer_cache
+
+
+if __name__ == "__main__":
+    # Check near-duplicate lookup offline
+    cache = AnswerCache()
+    cache.put("What is the redemption price for the full call of the 2031 notes?", "101.5%", "notice")
+    assert cache.get("what is the redemption price for the full call of the 2031 notes", "notice") == "101.5%"
+    assert cache.get("What's the redemption price for the full call of the 2031 notes?", "notice") == "101.5%"
+    assert cache.get("What is the redemption price for the full call of the 2030 notes?", "notice") is None
+    assert cache.get("What is the redemption price for the full call of the 2031 notes?", "other notice") is None
+    print(cache.metrics())
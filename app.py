@@ -1,20 +1,31 @@
 import streamlit as st
-import zipfile
+import uuid
 import os
-from io import BytesIO
 from typing import Dict, TypedDict, Annotated, Sequence
-from classificationAgent import process_pdfs
+import importlib
 import time
 import logging
-import pandas as pd
-import fullCall
-import merger
-import partialCall
-from datetime import date
+from datetime import date, timedelta
 from chat import chat_interface
+from llmController import get_controller
+from modelRouter import router_metrics
+from answerCache import get_answer_cache
+from documentStore import get_document_store
+from sharedCache import shared_cache_metrics
+from uploadPipeline import process_uploads, save_classified
+from warmup import start_warmup
+from usageStore import get_usage_store, set_session
+from resourceGovernor import ResourceLimitError, get_governor
+import profiler
+# Event modules are imported on first use to keep cold start fast
+from attributes import EVENT_MODULES
 
 st.set_page_config(layout="wide")
 
+# Optionally preload the LLM client, attribute lists and heavy modules in the background
+if os.environ.get("CA_WARMUP", "0") == "1":
+    start_warmup()
+
 st.markdown("""
 <style>
        .top-right {
@@ -35,6 +46,12 @@ if 'df' not in st.session_state:
     st.session_state.df = None
 if 'search_id' not in st.session_state:
     st.session_state.search_id = 0
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Token usage of every LLM call in this run is recorded against the session
+usage_store = get_usage_store()
+set_session(st.session_state.session_id)
     
     
 # Configure logging
@@ -46,6 +63,36 @@ logging.basicConfig(
         logging.FileHandler('execution_log.txt')
     ]
 )
+# Shared LLM controller metrics (queue depth, throttles, concurrency limit)
+with st.sidebar.expander("LLM Call Metrics", expanded=False):
+    st.json(get_controller().metrics())
+    st.json(router_metrics())
+    st.json(get_answer_cache().metrics())
+    st.json(get_document_store().metrics())
+    st.json(shared_cache_metrics())
+    st.json(get_governor().metrics())
+
+# Token and cost accounting: this session, today's most expensive documents, and exports
+with st.sidebar.expander("Token Usage", expanded=False):
+    # Only queried on request so the usage tables (and pandas) stay off the cold-start path
+    if st.checkbox("Show token usage"):
+        today = date.today().isoformat()
+        st.caption("This session")
+        st.dataframe(usage_store.rollup("label", session_id=st.session_state.session_id), hide_index=True)
+        st.caption("Today by document")
+        st.dataframe(usage_store.rollup("document", start_date=today, end_date=today).head(20), hide_index=True)
+        st.caption("By day")
+        st.dataframe(usage_store.rollup("day"), hide_index=True)
+        usage_calls = usage_store.calls(start_date=(date.today() - timedelta(days=30)).isoformat())
+        st.download_button("Download Last 30 Days (CSV)", usage_calls.to_csv(index=False), file_name="llm_usage.csv", mime="text/csv")
+        st.download_button("Download Last 30 Days (JSON)", usage_calls.to_json(orient="records", indent=2), file_name="llm_usage.json", mime="application/json")
+
+# Per-session profiling of uploads, classification and extraction; defaults to CA_PROFILE
+with st.sidebar.expander("Profiling", expanded=False):
+    profile_mode = st.selectbox("Profiler", profiler.MODES, index=profiler.MODES.index(profiler.DEFAULT_MODE) if profiler.DEFAULT_MODE in profiler.MODES else 0)
+    profiler.set_mode(profile_mode)
+    st.caption(f"Profiles are written to {profiler.PROFILE_DIR}")
+
 st.markdown("", unsafe_allow_html=True)
 st.markdown("", unsafe_allow_html=True)
 st.markdown("<h2 style='text-align: center;'>AI-Powered Corporate Action Data Ingestion</h2>", unsafe_allow_html=True)
@@ -88,41 +135,28 @@ uploaded_files = st.file_uploader(
 )
 st.markdown('</div>', unsafe_allow_html=True)
 
-@st.cache_data
+# Uploads are read, split and classified by the shared upload pipeline; the session keeps the per-file document keys
+@profiler.profiled("process_files")
 def process_files(uploaded_files):
-    pdf_files = {}
-    total_files = 0
-
-    for uploaded_file in uploaded_files:
-        try:
-            if uploaded_file.type == "application/x-zip-compressed":
-                with zipfile.ZipFile(uploaded_file, 'r') as zip_ref:
-                    for file_info in zip_ref.infolist():
-                        if file_info.filename.endswith('.pdf'):
-                            with zip_ref.open(file_info) as file:
-                                pdf_files[file_info.filename] = BytesIO(file.read())
-                                total_files += 1
-            elif uploaded_file.type == "application/pdf":
-                pdf_files[uploaded_file.name] = BytesIO(uploaded_file.read())
-                total_files += 1
-        except Exception as e:
-            st.error(f"Error processing {uploaded_file.name}: {e}")
-
-    if pdf_files:
-        result = process_pdfs(pdf_files)
-        return result, pdf_files, total_files
-    return None, {}, 0
+    upload_keys = st.session_state.setdefault('upload_keys', {})
+    return process_uploads(uploaded_files, st.session_state.session_id, upload_keys, lambda name, e: st.error(f"Error processing {name}: {e}"))
 
 if uploaded_files:
     with st.spinner('Processing files...'):
         start_time = time.time()
-        result, pdf_files, total_files = process_files(uploaded_files)
+        try:
+            result, pdf_files, total_files = process_files(uploaded_files)
+        except ResourceLimitError as e:
+            st.error(str(e))
+            st.stop()
         st.session_state.processed_data = result
 
         if result:
             main_folder = "Classified_PDFs"
             os.makedirs(main_folder, exist_ok=True)
 
+            import pandas as pd
+
             table_data = []
             counter = 100
             today = date.today()
@@ -152,21 +186,28 @@ if uploaded_files:
             logging.info(f"Execution time: {end_time - start_time:.2f} seconds")
 
             # Save files to folders
-            categorized_files = {}
-            for doc in result['documents']:
-                doc_type = doc['document_type']
-                if doc_type not in categorized_files:
-                    categorized_files[doc_type] = []
-                categorized_files[doc_type].append(doc['file_name'])
-
-            for category, files in categorized_files.items():
-                category_folder = os.path.join(main_folder, category)
-                os.makedirs(category_folder, exist_ok=True)
-                for file_name in files:
-                    if file_name in pdf_files:
-                        file_path = os.path.join(category_folder, file_name)
-                        with open(file_path, 'wb') as f:
-                            f.write(pdf_files[file_name].getbuffer())
+            expired = save_classified(result['documents'], pdf_files, main_folder, st.session_state.upload_keys)
+            if expired:
+                st.warning(f"These documents expired from the document store, please upload them again: {', '.join(expired)}")
+
+            # Missing data emails for every document in the upload, one per agent
+            with st.expander("Bulk Missing Data Emails", expanded=False):
+                if st.button("Generate Emails for All Documents"):
+                    from bulkEmail import extract_all
+                    with st.spinner('Extracting all documents...'):
+                        st.session_state.bulk_extractions = extract_all(result['documents'])
+                if st.session_state.get('bulk_extractions'):
+                    from bulkEmail import generate_bulk_emails, build_eml_zip
+                    bulk_emails = generate_bulk_emails(st.session_state.bulk_extractions)
+                    st.success(f"{len(bulk_emails)} consolidated emails generated")
+                    st.download_button(
+                        label="Download .eml Files",
+                        data=build_eml_zip(st.session_state.bulk_extractions),
+                        file_name="missing_data_emails.zip",
+                        mime="application/zip"
+                    )
+                    for agent, email_content in bulk_emails.items():
+                        st.text_area(agent, email_content, height=250)
 
 # Initialize session states
 if 'search_results' not in st.session_state:
@@ -232,12 +273,9 @@ if st.session_state.df is not None:
                 st.markdown("</div>", unsafe_allow_html=True)
                             
                 # Perform actions based on 'CA Event'
-                if ca_events[0] == "Full Call":
-                    fullCall.show(file_names[0])
-                elif ca_events[0] == "Partial Call":
-                    partialCall.show(file_names[0])
-                elif ca_events[0] == "Merger":
-                    merger.show(file_names[0])
+                if ca_events[0] in EVENT_MODULES:
+                    event_module = importlib.import_module(EVENT_MODULES[ca_events[0]])
+                    event_module.show(file_names[0])
             
                     
 
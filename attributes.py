@@ -0,0 +1,60 @@
+import os
+import re
+from functools import lru_cache
+
+# Module handling each CA event
+EVENT_MODULES = {
+    "Full Call": "fullCall",
+    "Partial Call": "partialCall",
+    "Merger": "merger",
+}
+
+# Attribute list for each CA event, as maintained by the operations team
+ATTRIBUTE_FILES = {
+    "Full Call": os.path.join("Data", "attributeList.csv"),
+    "Partial Call": os.path.join("Data", "attributeList.csv"),
+    "Merger": os.path.join("Data", "meregrAttribute.csv"),
+}
+
+# Normalised attribute names used to identify the issuer, security and agent of an event
+ISSUER_ATTRIBUTES = {
+    "Full Call": "issuername",
+    "Partial Call": "issuername",
+    "Merger": "acquiringcompany",
+}
+SECURITY_ATTRIBUTES = {
+    "Full Call": "subissuetype",
+    "Partial Call": "subissuetype",
+    "Merger": "casubevent",
+}
+AGENT_ATTRIBUTE = "trusteeagentpayingagent"
+CONTACT_EMAIL_ATTRIBUTE = "contactemail"
+NOT_AVAILABLE = "Not Available"
+
+_name_pattern = re.compile('[^a-z0-9]')
+
+
+@lru_cache(maxsize=None)
+def _read_attributes(path):
+    import pandas as pd
+    return pd.read_csv(path)
+
+
+# Function to load the attribute list for an event (cached per process, copy per caller)
+def load_attributes(event_type):
+    return _read_attributes(ATTRIBUTE_FILES[event_type]).copy()
+
+
+# Function to convert an attribute name to lower case and remove special characters
+def normalise_attribute_name(name):
+    return _name_pattern.sub('', str(name).lower())
+
+
+# Function to list the attributes the operations team must have for an event
+def mandatory_attributes(event_type):
+    attributes = load_attributes(event_type)
+    if 'Attribute Type' in attributes.columns:
+        mandatory = attributes[attributes['Attribute Type'].astype(str).str.strip().str.lower() == 'mandatory']
+        if not mandatory.empty:
+            attributes = mandatory
+    return [normalise_attribute_name(name) for name in attributes['Attribute Name']]
@@ -0,0 +1,52 @@
+import sys
+import subprocess
+
+# Modules imported on the app's cold-start path, plus the ones it now defers
+MODULES = [
+    "streamlit",
+    "pandas",
+    "PyPDF2",
+    "langchain_aws",
+    "llmClient",
+    "chat",
+    "classificationAgent",
+    "fullCall",
+    "partialCall",
+    "merger",
+]
+
+
+# Function to time an import in a fresh interpreter so nothing is already cached
+def time_import(module_name, runs=3):
+    timings = []
+    for _ in range(runs):
+        code = f"import time; t = time.perf_counter(); import {module_name}; print(time.perf_counter() - t)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+
+# Function to list the slowest imports reported by `python -X importtime`
+def slowest_imports(module_name, top=15):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module_name}"], capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(cumulative_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    modules = sys.argv[1:] or MODULES
+    print(f"{'Module':<22}{'Import time (s)':>16}")
+    for module_name in modules:
+        elapsed = time_import(module_name)
+        print(f"{module_name:<22}{'failed' if elapsed is None else f'{elapsed:.3f}':>16}")
+    print()
+    print(f"Slowest imports under {modules[0]}:")
+    for cumulative_us, name in slowest_imports(modules[0]):
+        print(f"{cumulative_us / 1e6:>8.3f}s  {name}")
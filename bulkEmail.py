@@ -0,0 +1,152 @@
+import os
+import io
+import logging
+import zipfile
+import importlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from resultStore import append_extraction
+from sharedCache import shared_extract, shared_read_pdf
+from usageStore import bind_usage_context, usage_context
+from attributes import (
+    EVENT_MODULES, ISSUER_ATTRIBUTES, SECURITY_ATTRIBUTES, AGENT_ATTRIBUTE, CONTACT_EMAIL_ATTRIBUTE,
+    NOT_AVAILABLE, mandatory_attributes, normalise_attribute_name,
+)
+
+UNKNOWN_AGENT = "<Issuer Agent/Paying Agent>"
+SENDER = os.environ.get("CA_EMAIL_SENDER", "ca-operations@dtcc.com")
+MAX_WORKERS = int(os.environ.get("CA_BULK_WORKERS", "4"))
+
+bulk_logger = logging.getLogger("bulk_email")
+
+
+# Function to run the event extraction for one classified document
+def extract_document(document, folder="Classified_PDFs"):
+    event_type = document['document_type']
+    event_module = importlib.import_module(EVENT_MODULES[event_type])
+    file_path = os.path.join(folder, event_type, document['file_name'])
+    pdf_data = shared_read_pdf(file_path, event_module.read_pdf)
+    with usage_context(document=document['file_name']):
+        attributes = shared_extract(event_type, pdf_data, event_module.extract_attributes)
+    append_extraction(document['file_name'], event_type, attributes)
+    return {
+        "file_name": document['file_name'],
+        "event_type": event_type,
+        "attributes": attributes,
+    }
+
+
+# Function to extract every supported document of an upload in parallel
+def extract_all(documents, folder="Classified_PDFs"):
+    documents = [document for document in documents if document.get('document_type') in EVENT_MODULES]
+    # Import the event modules on the calling (script) thread before fanning out
+    for event_type in {document['document_type'] for document in documents}:
+        importlib.import_module(EVENT_MODULES[event_type])
+    extractions = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {pool.submit(bind_usage_context(extract_document), document, folder): document for document in documents}
+        for future, document in futures.items():
+            try:
+                extractions.append(future.result())
+            except Exception as e:
+                bulk_logger.error(f"Extraction failed for {document['file_name']}: {e}")
+    return extractions
+
+
+# Function to find the mandatory attributes an extraction could not fill
+def find_missing(extraction):
+    values = {normalise_attribute_name(name): value for name, value in extraction['attributes'].items()}
+    missing = []
+    for name in mandatory_attributes(extraction['event_type']):
+        value = values.get(name, NOT_AVAILABLE)
+        if not str(value).strip() or str(value).strip().lower() in ("not available", "not avilable"):
+            missing.append(name)
+    return values, missing
+
+
+def _available(value):
+    return str(value).strip().lower() not in ("", "not available", "not avilable")
+
+
+# Function to group the missing data requests by issuer agent / paying agent;
+# falls back to the issuer, then to a placeholder greeting when neither was extracted
+def group_by_agent(extractions):
+    groups = defaultdict(list)
+    for extraction in extractions:
+        values, missing = find_missing(extraction)
+        if not missing:
+            continue
+        event_type = extraction['event_type']
+        agent = values.get(AGENT_ATTRIBUTE, NOT_AVAILABLE)
+        if not _available(agent):
+            agent = values.get(ISSUER_ATTRIBUTES[event_type], NOT_AVAILABLE)
+        if not _available(agent):
+            agent = UNKNOWN_AGENT
+        contact = values.get(CONTACT_EMAIL_ATTRIBUTE, NOT_AVAILABLE)
+        groups[agent].append({
+            "file_name": extraction['file_name'],
+            "event_type": event_type,
+            "issuer": values.get(ISSUER_ATTRIBUTES[event_type], NOT_AVAILABLE),
+            "security": values.get(SECURITY_ATTRIBUTES[event_type], NOT_AVAILABLE),
+            "contact": str(contact).strip() if _available(contact) else "",
+            "missing": missing,
+        })
+    return dict(groups)
+
+
+# Function to render one consolidated missing data email for an agent
+def render_email(agent, requests):
+    sections = []
+    for number, request in enumerate(requests, start=1):
+        missing_data_list = "\n   - ".join(request['missing'])
+        sections.append(f"""{number}. Issuer: {request['issuer']}
+   Security Name: {request['security']}
+   Event Type: {request['event_type']}
+   Document: {request['file_name']}
+   Missing:
+   - {missing_data_list}""")
+    issue_list = "\n\n".join(sections)
+    return f"""
+Hi {agent},
+
+Upon review of the corporate action notices received today, we have identified the following mandatory data points that are currently missing:
+
+{issue_list}
+
+To ensure accurate processing and timely communication to stakeholders, please provide the missing details at your earliest convenience. 
+Let us know if further clarification is needed. 
+
+Regards,
+DTC CA Operations Team
+"""
+
+
+# Function to build an .eml message for an agent's consolidated email
+def build_eml(agent, requests):
+    message = EmailMessage()
+    message['From'] = SENDER
+    recipients = sorted({request['contact'] for request in requests if request['contact']})
+    # Without an extracted contact address the To header is left for the operator to fill in
+    if recipients:
+        message['To'] = ", ".join(recipients)
+    message['Subject'] = f"Missing corporate action data - {len(requests)} event(s)"
+    message.set_content(render_email(agent, requests))
+    return message
+
+
+# Function to render every agent's email in one pass; returns {agent: email text}
+def generate_bulk_emails(extractions):
+    groups = group_by_agent(extractions)
+    bulk_logger.info(f"Generated {len(groups)} missing data emails covering {sum(len(r) for r in groups.values())} documents")
+    return {agent: render_email(agent, requests) for agent, requests in groups.items()}
+
+
+# Function to package every agent's email as .eml files inside a ZIP archive
+def build_eml_zip(extractions):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for number, (agent, requests) in enumerate(group_by_agent(extractions).items(), start=1):
+            safe_name = "".join(ch if ch.isalnum() else "_" for ch in agent).strip("_")[:60] or "agent"
+            zip_file.writestr(f"{number:03d}_{safe_name}.eml", bytes(build_eml(agent, requests)))
+    return buffer.getvalue()
@@ -0,0 +1,142 @@
+import os
+import re
+import logging
+from io import BytesIO
+
+# Signals that a page starts a new notice; a page needs BOUNDARY_SCORE points to open a new segment
+TITLE_PATTERN = re.compile(
+    r'^\s*(?:conditional\s+)?(?:notice\s+of\b|notice\s+to\s+(?:the\s+)?holders\b|notice\s+of\s+(?:full|partial|optional|mandatory|conditional)\b|'
+    r'agreement\s+and\s+plan\s+of\s+merger\b|(?:full|partial)\s+(?:call|redemption)\b|redemption\s+notice\b)',
+    re.IGNORECASE)
+CUSIP_PATTERN = re.compile(r'\bCUSIP(?:\s+(?:No\.?|Number|#))?[\s:#]*([0-9A-Z]{6}[0-9A-Z]{2}[0-9])\b', re.IGNORECASE)
+PAGE_NUMBER_PATTERN = re.compile(r'^\s*(?:page\s+)?-?\s*(\d{1,4})\s*-?(?:\s+of\s+\d{1,4})?\s*$', re.IGNORECASE)
+TITLE_SCORE = 2
+# A title already seen in the current notice (a running header), or a new one on a page that continues the
+# notice's page numbering and CUSIPs (a heading), only counts alongside a second signal
+RUNNING_TITLE_SCORE = 1
+CUSIP_CHANGE_SCORE = 1
+PAGE_RESET_SCORE = 2
+BOUNDARY_SCORE = int(os.environ.get("CA_BUNDLE_BOUNDARY_SCORE", "2"))
+HEADER_LINES = 6
+SPLIT_ENABLED = os.environ.get("CA_SPLIT_BUNDLES", "on") != "off"
+# Longer documents (merger agreements, proxies) are taken as one notice so their full text is not read at upload
+SPLIT_MAX_PAGES = int(os.environ.get("CA_SPLIT_MAX_PAGES", "40"))
+
+splitter_logger = logging.getLogger("bundle_splitter")
+
+
+def _lines(text):
+    return [line.strip() for line in (text or "").splitlines() if line.strip()]
+
+
+def _title(lines):
+    for line in lines[:HEADER_LINES]:
+        if TITLE_PATTERN.match(line) and "continued" not in line.lower():
+            return " ".join(line.lower().split())
+    return None
+
+
+def _page_number(lines):
+    # Page numbers sit on the first or last lines of a page
+    for line in lines[:2] + lines[-2:]:
+        match = PAGE_NUMBER_PATTERN.match(line)
+        if match:
+            return int(match.group(1))
+    return None
+
+
+# Function to score how strongly each page looks like the first page of a new notice
+def boundary_scores(page_texts):
+    scores = [0] * len(page_texts)
+    segment_cusips = set()
+    segment_titles = set()
+    previous_number = None
+    for index, text in enumerate(page_texts):
+        lines = _lines(text)
+        header = lines[:HEADER_LINES]
+        header_cusips = {match.upper() for line in header for match in CUSIP_PATTERN.findall(line)}
+        number = _page_number(lines)
+        title = _title(lines)
+        if index > 0:
+            cusip_changed = bool(header_cusips and segment_cusips and not header_cusips & segment_cusips)
+            continues = number is not None and previous_number is not None and number == previous_number + 1
+            if title is not None:
+                if title in segment_titles or (continues and not cusip_changed):
+                    scores[index] += RUNNING_TITLE_SCORE
+                else:
+                    scores[index] += TITLE_SCORE
+            if cusip_changed:
+                scores[index] += CUSIP_CHANGE_SCORE
+            if number == 1 and previous_number is not None and previous_number >= 1:
+                scores[index] += PAGE_RESET_SCORE
+        if index > 0 and scores[index] >= BOUNDARY_SCORE:
+            segment_cusips = set()
+            segment_titles = set()
+        if title is not None:
+            segment_titles.add(title)
+        segment_cusips |= {match.upper() for match in CUSIP_PATTERN.findall(text or "")}
+        if number is not None:
+            previous_number = number
+    return scores
+
+
+# Function to find the (first page, last page) ranges of the notices in a bundle
+def find_segments(page_texts):
+    starts = [0] + [index for index, score in enumerate(boundary_scores(page_texts)) if index > 0 and score >= BOUNDARY_SCORE]
+    ends = starts[1:] + [len(page_texts)]
+    return [(start, end - 1) for start, end in zip(starts, ends)]
+
+
+# Function to split a PDF holding several notices into one PDF per notice; returns [(file name, bytes)].
+# A document with a single notice is returned unchanged. The page texts read here are kept in the shared
+# parsed-text cache, so extracting a notice later does not read its pages again
+def split_bundle(data, file_name):
+    if not SPLIT_ENABLED:
+        return [(file_name, data)]
+    from PyPDF2 import PdfReader, PdfWriter
+    from sharedCache import remember_pdf_text
+    reader = PdfReader(BytesIO(data))
+    if len(reader.pages) < 2 or len(reader.pages) > SPLIT_MAX_PAGES:
+        return [(file_name, data)]
+    page_texts = [page.extract_text() for page in reader.pages]
+    segments = find_segments(page_texts)
+    if len(segments) == 1:
+        remember_pdf_text(data, page_texts)
+        return [(file_name, data)]
+
+    stem, extension = os.path.splitext(file_name)
+    parts = []
+    for number, (first, last) in enumerate(segments, start=1):
+        writer = PdfWriter()
+        for page_number in range(first, last + 1):
+            writer.add_page(reader.pages[page_number])
+        buffer = BytesIO()
+        writer.write(buffer)
+        remember_pdf_text(buffer.getvalue(), page_texts[first:last + 1])
+        parts.append((f"{stem}_part{number}_p{first + 1}-{last + 1}{extension or '.pdf'}", buffer.getvalue()))
+    splitter_logger.info(f"Split {file_name} into {len(parts)} notices: {[name for name, _ in parts]}")
+    return parts
+
+
+if __name__ == "__main__":
+    # Check the boundary rules offline on page texts
+    running_header = [f"NOTICE OF FULL REDEMPTION\nACME Corp 5.25% Notes due 2030\nCUSIP No. 004421AB7\nterms of page {page}\n{page}" for page in range(1, 6)]
+    assert find_segments(running_header) == [(0, 4)], find_segments(running_header)
+
+    same_form_bundle = [f"NOTICE OF FULL REDEMPTION\nCUSIP No. 00442{number}AB7\nterms\nPage 1 of 1" for number in range(3)]
+    assert find_segments(same_form_bundle) == [(0, 0), (1, 1), (2, 2)], find_segments(same_form_bundle)
+
+    # A sentence starting like a title on a continuing page is not a new notice
+    continuation = ["NOTICE OF FULL REDEMPTION\nCUSIP No. 004421AB7\nterms\n1", "terms...\n2", "Notice of redemption has been mailed to DTC participants\n...\n3"]
+    assert find_segments(continuation) == [(0, 2)], find_segments(continuation)
+
+    # A running title that skips a table page
+    skipped_title = ["NOTICE OF FULL REDEMPTION\nCUSIP No. 004421AB7\nterms\n1", "Redemption schedule\ntable\n2", "NOTICE OF FULL REDEMPTION\nCUSIP No. 004421AB7\nmore terms\n3"]
+    assert find_segments(skipped_title) == [(0, 2)], find_segments(skipped_title)
+
+    mixed_bundle = ["NOTICE OF PARTIAL REDEMPTION\nterms\n1", "terms continued\n2", "AGREEMENT AND PLAN OF MERGER\nrecitals\n1", "AGREEMENT AND PLAN OF MERGER\narticle I\n2"]
+    assert find_segments(mixed_bundle) == [(0, 1), (2, 3)], find_segments(mixed_bundle)
+    # Without page numbers a different title is enough
+    unnumbered = ["NOTICE OF FULL REDEMPTION\nterms", "NOTICE OF PARTIAL REDEMPTION\nterms"]
+    assert find_segments(unnumbered) == [(0, 0), (1, 1)], find_segments(unnumbered)
+    print("Bundle boundary checks passed")
@@ -1,46 +1,92 @@
+import re
 import streamlit as st
-from langchain_aws import ChatBedrock
+import llmClient
+import modelRouter
+from answerCache import get_answer_cache
+from chatMemory import ConversationMemory
+from usageStore import usage_context
+
+# Messages rendered per rerun; the rest of the transcript stays in memory
+DISPLAY_MESSAGES = 20
+# Questions leaning on earlier turns ("and its record date?", "what about the previous one?") are never cached
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|also|what about|how about|then|so)\b|\b(it|its|that one|those|they|them|their|above|previous|earlier|same|again|you said)\b",
+    re.IGNORECASE)
 
 def init_session_state():
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    if "chat_memory" not in st.session_state:
+        st.session_state.chat_memory = ConversationMemory()
+    st.session_state.messages = st.session_state.chat_memory.messages
     if "llm" not in st.session_state:
-        st.session_state.llm = ChatBedrock(
-            model_id="anthropic.claude-3-5-sonnet-20241022-v2:0",
-            model_kwargs=dict(temperature=0),
-        )
+        st.session_state.llm = llmClient.get_llm()
 
 def chat_interface():
     st.subheader("💬 Chat with CorpAct Buddy")
     
 
     init_session_state()
+    st.session_state.chat_document = current_document()
+    chat_fragment()
+
+# Function to identify the document being researched: the content keys of the selected rows
+def current_document():
+    results = st.session_state.get("search_results")
+    if results is None or results.empty:
+        return ""
+    names = set(results['File Name'])
+    keys = {key for documents in st.session_state.get('upload_keys', {}).values() for name, key in documents if name in names}
+    return ",".join(sorted(keys or names))
+
+# Function to tell whether a question depends on earlier turns of the conversation
+def is_follow_up(memory, prompt):
+    return bool(memory.window) and bool(FOLLOW_UP_PATTERN.search(prompt))
+
+# Function to answer a chat question and add the exchange to the conversation memory.
+# Standalone questions are answered from the cache shared by all sessions, keyed on the question and
+# the document; follow-ups that depend on earlier turns always go to the model
+def answer_question(memory, prompt, session_id="", document=""):
+    answer_cache = get_answer_cache()
+    follow_up = is_follow_up(memory, prompt)
+    response = None if follow_up else answer_cache.get(prompt, document)
+    if response is None:
+        with usage_context(session=session_id):
+            response = modelRouter.invoke(memory.build_prompt(prompt), "chat").content
+        if not follow_up:
+            answer_cache.put(prompt, response, document)
+    memory.add("user", prompt)
+    memory.add("assistant", response)
+    return response
+
+# Runs as a fragment so sending a message reruns only the chat, not the extraction page
+@st.fragment
+def chat_fragment():
+    memory = st.session_state.chat_memory
 
-    for message in st.session_state.messages:
+    hidden = len(memory.messages) - DISPLAY_MESSAGES + memory.dropped_messages
+    if hidden > 0:
+        st.caption(f"{hidden} earlier messages not shown")
+    for message in memory.messages[-DISPLAY_MESSAGES:]:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
     if prompt := st.chat_input("Welcome back, How can I assist you with your Corporate Actions Research today?"):
 
-        st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
         
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-
-                    response = st.session_state.llm.predict(prompt)
+                    # Fragment reruns skip the page script, so the session is attributed here
+                    response = answer_question(memory, prompt, st.session_state.get("session_id", ""), st.session_state.get("chat_document", ""))
                     
                     st.markdown(response)
-                    
-
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": response
-                    })
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
 
+        # Older turns are summarised after the answer is on screen, not behind the spinner
+        with usage_context(session=st.session_state.get("session_id", "")):
+            memory.compact()
+
 if __name__ == "__main__":
-    chat_interface()
\ No newline at end of file
+    chat_interface()
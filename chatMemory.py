@@ -0,0 +1,90 @@
+import os
+import logging
+from tokenBudget import estimate_tokens
+
+# Tokens of recent turns sent verbatim; older turns are folded into a rolling summary
+WINDOW_TOKENS = int(os.environ.get("CA_CHAT_WINDOW_TOKENS", "3000"))
+SUMMARY_TOKENS = int(os.environ.get("CA_CHAT_SUMMARY_TOKENS", "500"))
+# Once the window is over budget it is cut back to this share of it, so summaries run rarely and in bulk
+LOW_WATER_RATIO = float(os.environ.get("CA_CHAT_LOW_WATER_RATIO", "0.5"))
+# Transcript kept per session for display; older messages are dropped
+MAX_STORED_MESSAGES = int(os.environ.get("CA_CHAT_MAX_MESSAGES", "200"))
+
+memory_logger = logging.getLogger("chat_memory")
+
+
+def _format_turns(turns):
+    return "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+
+
+# Function to fold evicted turns into the running summary using the fast model tier
+def summarise(summary, turns):
+    import modelRouter
+    prompt = f"""Update the summary of a conversation between a corporate actions analyst and the CorpAct Buddy assistant.
+Keep facts, securities, dates and open questions. Use at most {SUMMARY_TOKENS} tokens. Return only the summary.
+
+Current summary:
+{summary or "(none)"}
+
+New turns:
+{_format_turns(turns)}"""
+    try:
+        return modelRouter.invoke(prompt, "summary", label="chat summary").content.strip()
+    except Exception as e:
+        # Keep the conversation going even if summarisation fails; fall back to clipped turns
+        memory_logger.warning(f"Chat summarisation failed, clipping instead: {e}")
+        clipped = " ".join(f"{turn['role']}: {turn['content'][:200]}" for turn in turns)
+        return (summary + " " + clipped).strip()[-SUMMARY_TOKENS * 4:]
+
+
+# Per-session chat memory: bounded transcript, token-bounded window of recent turns and a rolling summary
+class ConversationMemory:
+    def __init__(self, window_tokens=WINDOW_TOKENS, max_stored_messages=MAX_STORED_MESSAGES, low_water_ratio=LOW_WATER_RATIO):
+        self.window_tokens = window_tokens
+        self.low_water_tokens = int(window_tokens * min(low_water_ratio, 1.0))
+        self.max_stored_messages = max_stored_messages
+        self.messages = []
+        self.window = []
+        self.summary = ""
+        self.dropped_messages = 0
+
+    def add(self, role, content):
+        message = {"role": role, "content": content}
+        self.messages.append(message)
+        if len(self.messages) > self.max_stored_messages:
+            overflow = len(self.messages) - self.max_stored_messages
+            del self.messages[:overflow]
+            self.dropped_messages += overflow
+
+        self.window.append(message)
+
+    # Function to fold the oldest turns into the summary once the window is over budget; called once per
+    # exchange, after the answer is shown. Returns whether a summary call was made
+    def compact(self):
+        if len(self.window) <= 2 or estimate_tokens(_format_turns(self.window)) <= self.window_tokens:
+            return False
+        evicted = []
+        # Cut back to the low-water mark, always keeping the latest exchange verbatim
+        while len(self.window) > 2 and estimate_tokens(_format_turns(self.window)) > self.low_water_tokens:
+            evicted.append(self.window.pop(0))
+        self.summary = summarise(self.summary, evicted)
+        return True
+
+    # Text the model sees before the new question; also identifies the conversation for caching
+    def context(self):
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation:\n{self.summary}")
+        if self.window:
+            parts.append(f"Recent conversation:\n{_format_turns(self.window)}")
+        return "\n\n".join(parts)
+
+    def build_prompt(self, question):
+        context = self.context()
+        if not context:
+            return question
+        return f"""{context}
+
+Answer the user's latest question, using the conversation above where relevant.
+
+User: {question}"""
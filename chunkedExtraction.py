@@ -0,0 +1,145 @@
+import os
+import re
+import logging
+from datetime import datetime
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import modelRouter
+from tokenBudget import estimate_tokens, input_budget
+from textNormaliser import PAGE_BREAK
+from schemas import NOT_AVAILABLE
+from usageStore import bind_usage_context
+
+# auto: chunk only documents above CHUNK_THRESHOLD_TOKENS or the model's input budget; on / off force it
+CHUNKED_MODE = os.environ.get("CA_CHUNKED_EXTRACTION", "auto")
+CHUNK_THRESHOLD_TOKENS = int(os.environ.get("CA_CHUNK_THRESHOLD_TOKENS", "20000"))
+CHUNK_TOKENS = int(os.environ.get("CA_CHUNK_TOKENS", "6000"))
+OVERLAP_TOKENS = int(os.environ.get("CA_CHUNK_OVERLAP_TOKENS", "400"))
+MAX_WORKERS = int(os.environ.get("CA_CHUNK_WORKERS", "6"))
+
+# Sections that define terms ("Effective Time" means ...) are the most reliable source of a value
+DEFINED_TERM_PATTERN = re.compile(r'["“][A-Z][^"”\n]{1,60}["”]\s*(?:shall\s+)?(?:means?|has the meaning|shall have the meaning)', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'\b(?:\d{1,2}/\d{1,2}/\d{2,4}|\d{4}-\d{2}-\d{2}|[A-Z][a-z]{2,8}\.? \d{1,2}, \d{4}|\d{1,2} [A-Z][a-z]{2,8} \d{4})\b')
+DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%Y-%m-%d", "%B %d, %Y", "%b %d, %Y", "%b. %d, %Y", "%d %B %Y", "%d %b %Y")
+
+chunk_logger = logging.getLogger("chunked_extraction")
+
+
+# Function to decide whether a document is long enough to be extracted chunk by chunk
+def should_chunk(text, model_id, reserve_tokens=0):
+    if CHUNKED_MODE == "off":
+        return False
+    if CHUNKED_MODE == "on":
+        return True
+    tokens = estimate_tokens(text, model_id)
+    return tokens > CHUNK_THRESHOLD_TOKENS or tokens > input_budget(model_id, reserve_tokens)
+
+
+# Function to break a unit over max_tokens at line ends, then at spaces, so no cut falls inside a word;
+# returns [(piece, tokens, separator before the piece)]
+def _split_unit(unit, model_id, max_tokens, separator):
+    tokens = estimate_tokens(unit, model_id)
+    inner = "\n" if "\n" in unit.strip() else " "
+    parts = [part for part in unit.split(inner) if part.strip()]
+    if tokens <= max_tokens or len(parts) < 2:
+        return [(unit, tokens, separator)]
+    pieces, current, current_tokens = [], [], 0
+    for part in parts:
+        part_tokens = estimate_tokens(part, model_id)
+        if current and current_tokens + part_tokens > max_tokens:
+            pieces.append(inner.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += part_tokens
+    pieces.append(inner.join(current))
+    split = []
+    for number, piece in enumerate(pieces):
+        split.extend(_split_unit(piece, model_id, max_tokens, separator if number == 0 else inner))
+    return split
+
+
+# Function to split text into overlapping chunks on page and paragraph boundaries. Pages are separated by
+# PAGE_BREAK; units are kept no larger than the overlap so the tail of each chunk can be carried into the next
+def split_sections(text, model_id=None, chunk_tokens=CHUNK_TOKENS, overlap_tokens=OVERLAP_TOKENS):
+    unit_tokens = min(overlap_tokens, chunk_tokens) if overlap_tokens > 0 else chunk_tokens
+    units = []
+    for page in text.split(PAGE_BREAK):
+        for paragraph in re.split(r'\n\s*\n', page):
+            if paragraph.strip():
+                units.extend(_split_unit(paragraph.strip(), model_id, unit_tokens, "\n\n"))
+
+    chunks, current, current_tokens = [], [], 0
+    for unit in units:
+        if current and current_tokens + unit[1] > chunk_tokens:
+            chunks.append(_join(current))
+            # Carry the tail of the previous chunk so values split across a boundary are seen whole
+            overlap, overlap_size = [], 0
+            for previous in reversed(current):
+                if overlap_size + previous[1] > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous[1]
+            current, current_tokens = overlap, overlap_size
+        current.append(unit)
+        current_tokens += unit[1]
+    if current:
+        chunks.append(_join(current))
+    return chunks
+
+
+def _join(units):
+    return "".join((separator if index else "") + text for index, (text, _, separator) in enumerate(units))
+
+
+def _available(value):
+    return str(value).strip().lower() not in ("", "not available", "not avilable", "none", "n/a")
+
+
+def _latest_date(values):
+    dated = []
+    for value in values:
+        for match in DATE_PATTERN.findall(value):
+            for date_format in DATE_FORMATS:
+                try:
+                    dated.append((datetime.strptime(match, date_format), value))
+                    break
+                except ValueError:
+                    continue
+    return max(dated)[1] if dated else None
+
+
+# Function to merge per-chunk candidates into one value per attribute:
+# defined-term sections win, dates resolve to the latest, otherwise the most frequent value
+def reduce_candidates(candidates, chunks):
+    defines_terms = [bool(DEFINED_TERM_PATTERN.search(chunk)) for chunk in chunks]
+    reduced = {}
+    for attribute in candidates[0] if candidates else []:
+        found = [(index, str(result[attribute]).strip()) for index, result in enumerate(candidates) if _available(result.get(attribute, NOT_AVAILABLE))]
+        if not found:
+            reduced[attribute] = NOT_AVAILABLE
+            continue
+        preferred = [value for index, value in found if defines_terms[index]] or [value for _, value in found]
+        if "date" in attribute.lower():
+            latest = _latest_date(preferred)
+            if latest is not None:
+                reduced[attribute] = latest
+                continue
+        counts = Counter(preferred)
+        # Ties go to the value seen first in the document
+        reduced[attribute] = max(preferred, key=lambda value: (counts[value], -preferred.index(value)))
+    return reduced
+
+
+# Function to extract attributes chunk by chunk in parallel and reduce the candidates
+def map_reduce_extract(text, make_prompt, schema, purpose, label, model_id=None):
+    chunks = split_sections(text, model_id)
+    chunk_logger.info(f"{label}: extracting {len(chunks)} chunks with up to {MAX_WORKERS} in parallel")
+
+    def extract_chunk(numbered_chunk):
+        number, chunk = numbered_chunk
+        return modelRouter.invoke(make_prompt(chunk), purpose, label=f"{label} chunk {number}", schema=schema).as_dict()
+
+    # The shared LLM controller still bounds how many calls reach Bedrock at once
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        candidates = list(pool.map(bind_usage_context(extract_chunk), enumerate(chunks, start=1)))
+    return reduce_candidates(candidates, chunks)
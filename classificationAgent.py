@@ -1,30 +1,57 @@
 import os
 import json
-import re
 from io import BytesIO
 from typing import Dict, TypedDict, Annotated, Sequence
-from PyPDF2 import PdfReader
-import requests
-from langchain_aws import ChatBedrock
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import modelRouter
+from tokenBudget import estimate_tokens, split_to_budget, forecast
+from textNormaliser import PAGE_BREAK, normalise_text
+from schemas import Classification
+from profiler import profiled
+from resourceGovernor import check_page_count
+from usageStore import bind_usage_context, usage_context
+
+# "early_exit" classifies on the cover pages and only reads further when unsure; "full" reads every page first
+CLASSIFICATION_MODE = os.environ.get("CA_CLASSIFICATION_MODE", "early_exit")
+CLASSIFY_PAGES = int(os.environ.get("CA_CLASSIFY_PAGES", "3"))
+CLASSIFY_CHARS = int(os.environ.get("CA_CLASSIFY_CHARS", "12000"))
+CONFIDENCE_THRESHOLD = float(os.environ.get("CA_CONFIDENCE_THRESHOLD", "70"))
+CLASSIFY_WORKERS = int(os.environ.get("CA_CLASSIFY_WORKERS", "4"))
 
 
 # Function to read PDF content
 def read_pdf(file_path): 
+    from PyPDF2 import PdfReader
     content = "" 
     with open(file_path, 'rb') as file: 
         reader = PdfReader(file) 
-        for page in reader.pages: 
-            content += page.extract_text()
+        check_page_count(reader, file_path)
+        content = PAGE_BREAK.join(page.extract_text() for page in reader.pages)
     return content
 
 # Function to read PDF content from file-like object
-def read_pdf_from_file(file): 
-    content = "" 
+def read_pdf_from_file(file, max_pages=None, max_chars=None): 
+    from PyPDF2 import PdfReader
     reader = PdfReader(file) 
-    for page in reader.pages: 
-        content += page.extract_text()
+    check_page_count(reader)
+    content, _ = read_pdf_pages(reader, 0, max_pages, max_chars)
     return content
 
+# Function to read pages from an open PDF reader, stopping at a page count or character budget
+def read_pdf_pages(reader, start_page=0, max_pages=None, max_chars=None):
+    pages = []
+    chars = 0
+    end_page = len(reader.pages) if max_pages is None else min(len(reader.pages), start_page + max_pages)
+    page_number = start_page
+    while page_number < end_page:
+        pages.append(reader.pages[page_number].extract_text())
+        chars += len(pages[-1])
+        page_number += 1
+        if max_chars is not None and chars >= max_chars:
+            break
+    return PAGE_BREAK.join(pages), page_number
+
 # Function to convert PDFs to JSON
 def convert_pdfs_to_json(files):
     pdf_dict = {}
@@ -39,10 +66,11 @@ def save_to_json(data, output_file):
         json.dump(data, file, ensure_ascii=False, indent=4)
 
 # Function to clean text
-def clean_text(text):
-    # Remove lines with a low proportion of alphabetic characters
-    lines = text.split('\n')
-    cleaned_lines = lines #[line for line in lines if len(line) > 0 and len(re.findall(r'[A-Za-z]', line)) / len(line) > 0.5]
+def clean_text(text, label="document"):
+    # Strip repeated headers/footers and low-information lines, then join the lines
+    normalised_text, _ = normalise_text(text, label=label)
+    lines = normalised_text.split('\n')
+    cleaned_lines = lines
     cleaned_text = ' '.join(cleaned_lines)
     
     # Replace newline characters with spaces
@@ -53,7 +81,7 @@ def clean_text(text):
 # Function to clean JSON data
 def clean_json(data):
     if isinstance(data, dict):
-        return {key: clean_json(value) for key, value in data.items()}
+        return {key: clean_text(value, key) if isinstance(value, str) else clean_json(value) for key, value in data.items()}
     elif isinstance(data, list):
         return [clean_json(item) for item in data]
     elif isinstance(data, str):
@@ -170,7 +198,96 @@ def create_prompt(classify):
             '''
 
 
+def classify_batch(batch, tier=None):
+    cleaned_pdf_data = json.dumps(batch,indent=2)
+    print('Cleaned json :',cleaned_pdf_data)
+    classify = create_prompt(cleaned_pdf_data)
+    print('classify:',classify)
+    # Usage is split across the batch's documents by the size of their text
+    with usage_context(document={filename: len(text) for filename, text in batch.items()}):
+        classification = modelRouter.invoke(classify, "classification", label="classification", tier=tier, schema=Classification)
+    return classification.model_dump()
+
+
+# Function to classify cleaned documents in prompts that fit the model's input budget
+def classify_documents(cleaned_pdf_data, tier=None):
+    model_id = modelRouter.TIERS[tier or modelRouter.initial_tier("classification")]
+    reserve_tokens = estimate_tokens(create_prompt(""), model_id)
+    batches = split_to_budget(cleaned_pdf_data, model_id, reserve_tokens)
+    logging.info(f"Classification forecast: {forecast([json.dumps(batch) for batch in batches], model_id)}")
+
+    # Batches (e.g. the notices of a split bundle) are classified in parallel
+    documents = []
+    with ThreadPoolExecutor(max_workers=CLASSIFY_WORKERS) as pool:
+        for result in pool.map(bind_usage_context(lambda batch: classify_batch(batch, tier)), batches):
+            documents.extend(result.get("documents", []))
+    return documents
+
+
+# Function to re-classify low-confidence documents on the strong model tier
+def escalate_unsure(results, cleaned_pdf_data):
+    unsure = {filename: text for filename, text in cleaned_pdf_data.items() if not is_confident(results.get(filename))}
+    if not unsure or modelRouter.initial_tier("classification") == "strong":
+        return results
+    for filename in unsure:
+        modelRouter.record_decision("classification", filename, "strong", f"confidence below {CONFIDENCE_THRESHOLD}")
+    for document in classify_documents(unsure, tier="strong"):
+        results[document['file_name']] = document
+    return results
+
+
+# Function to check whether a classification is confident enough to stop reading the document
+def is_confident(document):
+    if not document or document.get('document_type') == "Unknown":
+        return False
+    try:
+        score = float(str(document.get('confidence_score', 0)).strip().rstrip('%'))
+    except ValueError:
+        return False
+    return score >= CONFIDENCE_THRESHOLD
+
+
+# Function to classify on the first pages and read further pages only for low-confidence documents
+def process_pdfs_early_exit(files):
+    from PyPDF2 import PdfReader
+    readers = {filename: PdfReader(file) for filename, file in files.items()}
+    for filename, reader in readers.items():
+        check_page_count(reader, filename)
+    texts = {filename: "" for filename in files}
+    next_page = {filename: 0 for filename in files}
+    results = {}
+
+    pending = list(files)
+    max_pages, max_chars = CLASSIFY_PAGES, CLASSIFY_CHARS
+    while pending:
+        for filename in pending:
+            content, next_page[filename] = read_pdf_pages(readers[filename], next_page[filename], max_pages, max_chars)
+            texts[filename] += (PAGE_BREAK if texts[filename] else "") + content
+
+        for document in classify_documents(clean_json({filename: texts[filename] for filename in pending})):
+            results[document['file_name']] = document
+
+        # Documents with no pages left and still unsure go to the strong model tier
+        exhausted = [filename for filename in pending if next_page[filename] >= len(readers[filename].pages)]
+        escalate_unsure(results, clean_json({filename: texts[filename] for filename in exhausted}))
+
+        pending = [
+            filename for filename in pending
+            if not is_confident(results.get(filename)) and next_page[filename] < len(readers[filename].pages)
+        ]
+        if pending:
+            logging.info(f"Re-classifying {len(pending)} low-confidence documents with more pages: {pending}")
+        # Widen the window for the next pass
+        max_pages, max_chars = max_pages * 2, max_chars * 2
+
+    return {"documents": list(results.values())}
+
+
+@profiled("process_pdfs")
 def process_pdfs(files):
+    if CLASSIFICATION_MODE == "early_exit":
+        return process_pdfs_early_exit(files)
+
     # Convert PDFs to JSON
     pdf_data = convert_pdfs_to_json(files)
     
@@ -182,27 +299,7 @@ def process_pdfs(files):
     
     
 
-    cleaned_pdf_data = json.dumps(cleaned_pdf_data,indent=2)
-    print('Cleaned json :',cleaned_pdf_data)
-    classify = create_prompt(cleaned_pdf_data)
-    print('classify:',classify)
-    llm = ChatBedrock(
-    model_id="anthropic.claude-3-5-sonnet-20241022-v2:0",
-    model_kwargs=dict(temperature=0),
-    )
-    messages =[{
-           "role": "user",
-           "content": f"""{classify}"""   
-  }
-    ] 
-    ai_msg = llm.invoke(messages)
-    json_part = re.search(r'\{.*\}', ai_msg.content, re.DOTALL).group()
- 
-# Parse the extracted JSON string
-    documents_data = json.loads(json_part)
+    results = {document['file_name']: document for document in classify_documents(cleaned_pdf_data)}
+    documents_data = {"documents": list(escalate_unsure(results, cleaned_pdf_data).values())}
 
     return documents_data
-
-
-
-
@@ -0,0 +1,179 @@
+import os
+import mmap
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+# Global cap on document bytes held in memory across all sessions
+MAX_HOT_BYTES = int(os.environ.get("CA_DOCUMENT_CACHE_BYTES", str(256 * 1024 * 1024)))
+# Spooled copies on disk; served through mmap once they fall out of the hot set
+SPOOL_DIR = os.environ.get("CA_DOCUMENT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "ca_documents"))
+SPOOL_TTL_SECONDS = float(os.environ.get("CA_DOCUMENT_SPOOL_TTL", str(24 * 3600)))
+
+store_logger = logging.getLogger("document_store")
+
+
+# Raised for a key whose spooled copy has expired; the document has to be uploaded again
+class DocumentExpired(LookupError):
+    pass
+
+
+# Function to compute a file's document key (the sha256 of its content) without loading it whole
+def content_key(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Process-wide store of uploaded documents keyed by content hash: every document is spooled to disk,
+# and a byte-bounded LRU keeps the most recently used ones in memory
+class DocumentStore:
+    def __init__(self, max_hot_bytes=MAX_HOT_BYTES, spool_dir=SPOOL_DIR, spool_ttl_seconds=SPOOL_TTL_SECONDS):
+        self.max_hot_bytes = max_hot_bytes
+        self.spool_dir = spool_dir
+        self.spool_ttl_seconds = spool_ttl_seconds
+        self.hot = OrderedDict()
+        self.hot_bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {"puts": 0, "deduplicated": 0, "hot_hits": 0, "mmap_reads": 0, "evictions": 0, "evicted_bytes": 0}
+        os.makedirs(spool_dir, exist_ok=True)
+        self._last_cleanup = 0.0
+
+    def _path(self, key):
+        return os.path.join(self.spool_dir, f"{key}.pdf")
+
+    def _admit(self, key, data):
+        # Documents larger than the whole budget are only served from the spool
+        if len(data) > self.max_hot_bytes:
+            return
+        if key in self.hot:
+            self.hot.move_to_end(key)
+            return
+        self.hot[key] = data
+        self.hot_bytes += len(data)
+        while self.hot_bytes > self.max_hot_bytes:
+            _, evicted = self.hot.popitem(last=False)
+            self.hot_bytes -= len(evicted)
+            self.counters["evictions"] += 1
+            self.counters["evicted_bytes"] += len(evicted)
+
+    # Function to store document bytes and return their key; identical uploads share one copy
+    def put(self, data):
+        data = bytes(data)
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        with self.lock:
+            self.counters["puts"] += 1
+            if os.path.exists(path):
+                self.counters["deduplicated"] += 1
+                os.utime(path)
+            else:
+                temp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(temp_path, "wb") as file:
+                    file.write(data)
+                os.replace(temp_path, path)
+            self._admit(key, data)
+        self._cleanup()
+        return key
+
+    # Function to refresh a spooled copy's mtime so documents still in use outlive the spool TTL
+    def _touch(self, key):
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+    # Function to check whether a key can still be opened
+    def contains(self, key):
+        with self.lock:
+            if key in self.hot:
+                return True
+        return os.path.exists(self._path(key))
+
+    # Function to return a seekable, read-only file object for a document
+    def open(self, key):
+        self._touch(key)
+        with self.lock:
+            data = self.hot.get(key)
+            if data is not None:
+                self.hot.move_to_end(key)
+                self.counters["hot_hits"] += 1
+                return BytesIO(data)
+            self.counters["mmap_reads"] += 1
+        try:
+            file = open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise DocumentExpired(f"Document {key[:12]} has expired from the document store; upload it again")
+        with file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return BytesIO(b"")
+            # The page cache backs the mapping, so cold documents do not count against the process heap
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, key):
+        document = self.open(key)
+        try:
+            return document.read()
+        finally:
+            document.close()
+
+    # Function to copy a document to a path without loading it into the hot set. A copy that is already
+    # there is left alone, and a changed one is swapped in whole, so readers of the path never see a partial file
+    def write_to(self, key, file_path):
+        self._touch(key)
+        if os.path.exists(file_path) and content_key(file_path) == key:
+            return
+        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(self.read(key))
+        os.replace(temp_path, file_path)
+
+    # Function to drop spooled documents nobody has touched within the TTL
+    def _cleanup(self):
+        now = time.time()
+        if now - self._last_cleanup < 600:
+            return
+        self._last_cleanup = now
+        removed = 0
+        with self.lock:
+            hot_files = {f"{key}.pdf" for key in self.hot}
+        for name in os.listdir(self.spool_dir):
+            if name in hot_files:
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.spool_ttl_seconds:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            store_logger.info(f"Removed {removed} expired spooled documents")
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+            metrics["hot_documents"] = len(self.hot)
+            metrics["hot_bytes"] = self.hot_bytes
+            metrics["max_hot_bytes"] = self.max_hot_bytes
+        metrics["spooled_documents"] = sum(1 for name in os.listdir(self.spool_dir) if name.endswith(".pdf"))
+        return metrics
+
+
+_document_store = None
+_document_store_lock = threading.Lock()
+
+
+# Function to return the document store shared by every session in this process
+def get_document_store():
+    global _document_store
+    with _document_store_lock:
+        if _document_store is None:
+            _document_store = DocumentStore()
+        return _document_store
@@ -0,0 +1,198 @@
+import os
+import json
+import asyncio
+import logging
+import importlib
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from attributes import EVENT_MODULES
+from bundleSplitter import split_bundle
+from usageStore import bind_usage_context, get_usage_store, usage_context
+from resourceGovernor import AdmissionTimeout, ResourceLimitError, check_pdf, get_governor
+
+HOST = os.environ.get("CA_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.environ.get("CA_SERVICE_PORT", "8600"))
+# Requests run on WORKERS threads; up to QUEUE_SIZE more wait, beyond that callers get 503 + Retry-After
+WORKERS = int(os.environ.get("CA_SERVICE_WORKERS", "4"))
+QUEUE_SIZE = int(os.environ.get("CA_SERVICE_QUEUE", "16"))
+MAX_BODY_BYTES = int(os.environ.get("CA_SERVICE_MAX_BODY", str(100 * 1024 * 1024)))
+RETRY_AFTER_SECONDS = 5
+
+service_logger = logging.getLogger("extraction_service")
+
+
+# Admission control for the worker pool: a bounded number of running plus queued jobs
+class JobQueue:
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ca-service")
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.pending = 0
+        self.counters = {"accepted": 0, "rejected": 0, "completed": 0, "failed": 0}
+
+    # Function to run fn on the pool; returns None without running it when the queue is full
+    async def submit(self, fn, *args):
+        # Only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.capacity:
+            self.counters["rejected"] += 1
+            return None
+        self.pending += 1
+        self.counters["accepted"] += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+            self.counters["completed"] += 1
+            return result
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        finally:
+            self.pending -= 1
+
+    def metrics(self):
+        return dict(self.counters, pending=self.pending, queued=max(self.pending - self.workers, 0), capacity=self.capacity)
+
+
+# Function to collect the PDFs of a request: multipart files, or a raw PDF body named by ?file_name=
+def request_pdfs(request):
+    pdf_files = {}
+    for files in request.files.values():
+        for file in files:
+            pdf_files[os.path.basename(file["filename"])] = file["body"]
+    if not pdf_files and request.body:
+        file_name = request.query_arguments.get("file_name", [b"document.pdf"])[0].decode("utf-8")
+        pdf_files[os.path.basename(file_name)] = request.body
+    return pdf_files
+
+
+# Function to run a job under the resource governor: per-user concurrency and decompressed byte limits
+def governed(user, fn, pdf_files, *args):
+    with get_governor().admit(user) as job, usage_context(session=user):
+        for name, data in pdf_files.items():
+            job.charge(len(data))
+            check_pdf(data, name)
+        return fn(pdf_files, *args)
+
+
+def classify(pdf_files):
+    from documentStore import get_document_store
+    from sharedCache import classify_cached
+    document_store = get_document_store()
+    documents = {}
+    for name, data in pdf_files.items():
+        documents.update((segment_name, document_store.put(segment)) for segment_name, segment in split_bundle(data, name))
+    return classify_cached(documents)
+
+
+# Function to extract one document, classifying it first when the caller gives no event type
+def extract(file_name, data, event_type=None, store=True):
+    from classificationAgent import read_pdf_from_file
+    from resultStore import append_extraction
+    from sharedCache import shared_extract
+    if not event_type:
+        event_type = classify({file_name: data})["documents"][0]["document_type"]
+    if event_type not in EVENT_MODULES:
+        return {"file_name": file_name, "event_type": event_type, "attributes": None}
+    event_module = importlib.import_module(EVENT_MODULES[event_type])
+    with usage_context(document=file_name):
+        attributes = shared_extract(event_type, read_pdf_from_file(BytesIO(data)), event_module.extract_attributes)
+    if store:
+        append_extraction(file_name, event_type, attributes, source="api")
+    return {"file_name": file_name, "event_type": event_type, "attributes": attributes}
+
+
+# Function to extract every notice of the request; bundles are split and the notices extracted in parallel
+def extract_many(pdf_files, event_type=None, store=True):
+    segments = [segment for name, data in pdf_files.items() for segment in split_bundle(data, name)]
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        return list(pool.map(bind_usage_context(lambda segment: extract(segment[0], segment[1], event_type, store)), segments))
+
+
+def service_metrics(job_queue):
+    from llmController import get_controller
+    from modelRouter import router_metrics
+    from sharedCache import shared_cache_metrics
+    return {
+        "queue": job_queue.metrics(),
+        "llm": get_controller().metrics(),
+        "router": router_metrics()["tiers"],
+        "caches": shared_cache_metrics(),
+        "governor": get_governor().metrics(),
+    }
+
+
+def make_app(job_queue=None):
+    import tornado.web
+
+    job_queue = job_queue or JobQueue()
+
+    class BaseHandler(tornado.web.RequestHandler):
+        def write_json(self, payload, status=200):
+            self.set_status(status)
+            self.set_header("Content-Type", "application/json")
+            self.finish(json.dumps(payload))
+
+        async def run_job(self, fn, *args):
+            try:
+                result = await job_queue.submit(governed, self.request.remote_ip, fn, *args)
+            except AdmissionTimeout as e:
+                self.set_header("Retry-After", str(RETRY_AFTER_SECONDS))
+                return self.write_json({"error": str(e)}, 503)
+            except ResourceLimitError as e:
+                return self.write_json({"error": str(e)}, 413)
+            except Exception as e:
+                service_logger.exception(f"{self.request.path} failed")
+                return self.write_json({"error": str(e)}, 500)
+            if result is None:
+                self.set_header("Retry-After", str(RETRY_AFTER_SECONDS))
+                return self.write_json({"error": "Service busy, retry later"}, 503)
+            self.write_json(result)
+
+    class ClassifyHandler(BaseHandler):
+        async def post(self):
+            pdf_files = request_pdfs(self.request)
+            if not pdf_files:
+                return self.write_json({"error": "No PDF in request"}, 400)
+            await self.run_job(classify, pdf_files)
+
+    class ExtractHandler(BaseHandler):
+        async def post(self):
+            pdf_files = request_pdfs(self.request)
+            if not pdf_files:
+                return self.write_json({"error": "No PDF in request"}, 400)
+            event_type = self.get_query_argument("event_type", None)
+            if event_type and event_type not in EVENT_MODULES:
+                return self.write_json({"error": f"Unsupported event type {event_type}; expected one of {list(EVENT_MODULES)}"}, 400)
+            store = self.get_query_argument("store", "true").lower() != "false"
+            await self.run_job(extract_many, pdf_files, event_type, store)
+
+    class HealthHandler(BaseHandler):
+        def get(self):
+            metrics = job_queue.metrics()
+            self.write_json({"status": "busy" if metrics["pending"] >= metrics["capacity"] else "ok", **metrics})
+
+    class MetricsHandler(BaseHandler):
+        def get(self):
+            self.write_json(service_metrics(job_queue))
+
+    return tornado.web.Application([
+        (r"/classify", ClassifyHandler),
+        (r"/extract", ExtractHandler),
+        (r"/health", HealthHandler),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+async def serve(host=HOST, port=PORT):
+    get_usage_store()
+    app = make_app()
+    app.listen(port, address=host, max_body_size=MAX_BODY_BYTES)
+    service_logger.info(f"CA extraction service listening on http://{host}:{port}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    # Usage: python extractionService.py
+    #   curl -F file=@notice.pdf http://127.0.0.1:8600/classify
+    #   curl -F file=@notice.pdf "http://127.0.0.1:8600/extract?event_type=Full%20Call"
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(serve())
@@ -0,0 +1,206 @@
+import re
+import json
+import time
+import logging
+import threading
+from tokenBudget import estimate_tokens, record_usage
+from llmController import get_controller
+
+DEFAULT_MODEL_ID = "anthropic.claude-3-5-sonnet-20241022-v2:0"
+
+# Pulls the JSON object out of a model response
+JSON_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
+
+_llms = {}
+_structured_llms = {}
+_llms_lock = threading.Lock()
+
+client_logger = logging.getLogger("llm_client")
+
+# Optional factory used instead of Bedrock, e.g. a recorded or stand-in model for offline runs
+_llm_factory = None
+
+# Callbacks told about every completed call (label, model, tokens, latency)
+_call_listeners = []
+
+
+# Function to replace the Bedrock client with another chat model factory (None restores Bedrock)
+def set_llm_factory(factory):
+    global _llm_factory
+    with _llms_lock:
+        _llm_factory = factory
+        _llms.clear()
+        _structured_llms.clear()
+
+
+# Function to register a callback that receives a record of every LLM call
+def add_call_listener(listener):
+    _call_listeners.append(listener)
+
+
+def remove_call_listener(listener):
+    if listener in _call_listeners:
+        _call_listeners.remove(listener)
+
+
+def bedrock_llm(model_id=DEFAULT_MODEL_ID):
+    from langchain_aws import ChatBedrock
+    return ChatBedrock(
+        model_id=model_id,
+        model_kwargs=dict(temperature=0),
+    )
+
+
+# Function to return a shared Bedrock chat client per model id; with CA_LLM_CASSETTE=record|replay
+# calls go through the on-disk cassette store instead
+def get_llm(model_id=DEFAULT_MODEL_ID):
+    with _llms_lock:
+        if model_id not in _llms and _llm_factory is not None:
+            _llms[model_id] = _llm_factory(model_id)
+        if model_id not in _llms:
+            import llmTransport
+            if llmTransport.CASSETTE_MODE in ("record", "replay"):
+                live_llm = bedrock_llm(model_id) if llmTransport.CASSETTE_MODE == "record" else None
+                _llms[model_id] = llmTransport.CassetteLLM(llmTransport.CASSETTE_DIR, live_llm, model_id)
+            else:
+                _llms[model_id] = bedrock_llm(model_id)
+        return _llms[model_id]
+
+
+def _notify(label, model_id, estimated, ai_msg, elapsed):
+    input_tokens, output_tokens = record_usage(label, model_id, estimated, ai_msg, elapsed)
+    call = {
+        "label": label,
+        "model_id": model_id,
+        "estimated_input_tokens": estimated,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "latency": elapsed,
+    }
+    for listener in list(_call_listeners):
+        listener(call)
+
+
+# Function to send a single user prompt to the model through the shared controller and log token usage
+def invoke(prompt, label="llm", model_id=DEFAULT_MODEL_ID):
+    estimated = estimate_tokens(prompt, model_id)
+    messages = [{
+        "role": "user",
+        "content": f"""{prompt}"""
+    }]
+    start_time = time.time()
+    llm = get_llm(model_id)
+    ai_msg = get_controller().call(lambda: llm.invoke(messages))
+    _notify(label, model_id, estimated, ai_msg, time.time() - start_time)
+    return ai_msg
+
+
+# Function to return the tool-calling runnable that asks the model for `schema`, or None if unsupported
+def get_structured_llm(schema, model_id=DEFAULT_MODEL_ID):
+    llm = get_llm(model_id)
+    key = (model_id, schema)
+    with _llms_lock:
+        if key not in _structured_llms:
+            if not hasattr(llm, "with_structured_output"):
+                _structured_llms[key] = None
+            else:
+                _structured_llms[key] = llm.with_structured_output(schema, include_raw=True)
+        return _structured_llms[key]
+
+
+# Function to fix common damage in model JSON: surrounding text, trailing commas, truncation
+def repair_json(text):
+    start = text.find("{")
+    if start < 0:
+        raise ValueError("no JSON object in response")
+    text = text[start:]
+    # Find where the first object closes, ignoring brackets inside strings
+    stack = []
+    in_string = escaped = False
+    for position, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+            if not stack:
+                # A closed object only needs the text after it and any trailing commas removed
+                try:
+                    return json.loads(text[:position + 1])
+                except ValueError:
+                    return json.loads(re.sub(r",\s*([}\]])", r"\1", text[:position + 1]))
+    # Close a truncated response: finish the open string, then the open brackets
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+    if in_string:
+        text += '"'
+    text = re.sub(r",\s*$", "", text.rstrip())
+    text = re.sub(r',\s*"[^"]*"\s*:?\s*$', "", text)
+    return json.loads(text + "".join(reversed(stack)))
+
+
+def _validate(schema, data):
+    from pydantic import ValidationError
+    try:
+        return schema.model_validate(data), None
+    except ValidationError as e:
+        return None, e
+
+
+# Function to ask the model for output matching a pydantic schema, with local validation and targeted repair
+def invoke_structured(prompt, schema, label="llm", model_id=DEFAULT_MODEL_ID):
+    estimated = estimate_tokens(prompt, model_id)
+    messages = [{
+        "role": "user",
+        "content": f"""{prompt}"""
+    }]
+    start_time = time.time()
+    structured_llm = get_structured_llm(schema, model_id)
+    if structured_llm is not None:
+        result = get_controller().call(lambda: structured_llm.invoke(messages))
+        raw = result["raw"]
+        _notify(label, model_id, estimated, raw, time.time() - start_time)
+        if result.get("parsed") is not None:
+            return result["parsed"]
+        tool_calls = getattr(raw, "tool_calls", None) or []
+        candidate = tool_calls[0]["args"] if tool_calls else raw.content
+    else:
+        # Models without tool calling (e.g. stand-ins) answer in plain text
+        raw = get_controller().call(lambda: get_llm(model_id).invoke(messages))
+        _notify(label, model_id, estimated, raw, time.time() - start_time)
+        candidate = raw.content
+
+    if isinstance(candidate, list):
+        candidate = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in candidate)
+    try:
+        data = candidate if isinstance(candidate, dict) else repair_json(candidate)
+        parsed, error = _validate(schema, data)
+    except ValueError as e:
+        parsed, error = None, e
+    if parsed is not None:
+        return parsed
+
+    # Targeted repair: send back only the broken output and the validation errors, not the document
+    client_logger.warning(f"{label}: structured output failed validation, requesting repair: {error}")
+    repair_prompt = f"""The following output must be a JSON object matching this JSON schema:
+{json.dumps(schema.model_json_schema())}
+
+Output:
+{candidate if isinstance(candidate, str) else json.dumps(candidate)}
+
+Validation errors:
+{error}
+
+Return only the corrected JSON object."""
+    repair_msg = invoke(repair_prompt, label=f"{label} repair", model_id=model_id)
+    parsed, error = _validate(schema, repair_json(repair_msg.content))
+    if parsed is None:
+        raise ValueError(f"{label}: model output does not match {schema.__name__}: {error}")
+    return parsed
@@ -0,0 +1,264 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+controller_logger = logging.getLogger("llm_controller")
+
+THROTTLE_CODES = ("ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException", "ModelNotReadyException")
+
+
+class ThrottlingError(Exception):
+    pass
+
+
+# Function to decide whether an exception from Bedrock is a throttle worth retrying
+def is_throttle_error(exc):
+    if isinstance(exc, ThrottlingError):
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code", "")
+        if code in THROTTLE_CODES:
+            return True
+    message = str(exc)
+    return any(code in message for code in THROTTLE_CODES) or "Too many requests" in message or "Rate exceeded" in message
+
+
+# Request-rate limiter: refills `rate` tokens per second up to `capacity`.
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# Concurrency limit that grows additively on success and halves on throttling.
+class AIMDLimiter:
+    def __init__(self, initial, minimum, maximum, increase=1.0, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, blocking=True):
+        with self.condition:
+            if not blocking:
+                if self.in_flight >= int(self.limit):
+                    return False
+                self.in_flight += 1
+                return True
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    self.condition.wait()
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        with self.condition:
+            # Additive increase: one extra slot per `limit` successful calls
+            self.limit = min(self.maximum, self.limit + self.increase / max(self.limit, 1.0))
+            self.condition.notify_all()
+
+    def on_throttle(self):
+        with self.condition:
+            self.limit = max(self.minimum, self.limit * self.decrease)
+
+
+# Shared gate for every LLM call: rate limiting, adaptive concurrency, retries and hedging.
+class LLMController:
+    def __init__(self, max_concurrency=8, min_concurrency=1, initial_concurrency=4,
+                 requests_per_second=5.0, burst=10, max_retries=6, base_delay=1.0,
+                 max_delay=30.0, hedge_after=None):
+        self.limiter = AIMDLimiter(initial_concurrency, min_concurrency, max_concurrency)
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.hedge_pool = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="llm-hedge") if hedge_after else None
+        self.metrics_lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "throttles": 0,
+            "retries": 0,
+            "hedges_sent": 0,
+            "hedges_won": 0,
+        }
+
+    def _count(self, name, amount=1):
+        with self.metrics_lock:
+            self.counters[name] += amount
+
+    # Function to compute the exponential backoff with full jitter for an attempt
+    def backoff_delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    # Function to make one call; `reserved` means the caller already holds a rate token and a concurrency slot
+    def _attempt(self, fn, reserved=False):
+        if not reserved:
+            self.bucket.acquire()
+            self.limiter.acquire()
+        try:
+            result = fn()
+        except Exception as exc:
+            if is_throttle_error(exc):
+                self.limiter.on_throttle()
+            raise
+        finally:
+            self.limiter.release()
+        self.limiter.on_success()
+        return result
+
+    def _hedged_attempt(self, fn):
+        primary = self.hedge_pool.submit(self._attempt, fn)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done:
+            return primary.result()
+        # Only hedge when it will not push us over the rate or concurrency limits; the slot and token
+        # reserved here are the ones the hedge uses
+        if not self.limiter.acquire(blocking=False):
+            return primary.result()
+        if not self.bucket.try_acquire():
+            self.limiter.release()
+            return primary.result()
+        self._count("hedges_sent")
+        hedge = self.hedge_pool.submit(self._attempt, fn, True)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        winner = done.pop()
+        if winner is hedge and hedge.exception() is None:
+            self._count("hedges_won")
+        if winner.exception() is not None:
+            other = hedge if winner is primary else primary
+            return other.result()
+        return winner.result()
+
+    # Function to run an LLM call through the controller, retrying throttles with backoff
+    def call(self, fn, hedge=True):
+        self._count("calls")
+        attempt = 0
+        while True:
+            try:
+                if hedge and self.hedge_pool is not None:
+                    result = self._hedged_attempt(fn)
+                else:
+                    result = self._attempt(fn)
+                self._count("successes")
+                return result
+            except Exception as exc:
+                if not is_throttle_error(exc):
+                    self._count("failures")
+                    raise
+                self._count("throttles")
+                if attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = self.backoff_delay(attempt)
+                controller_logger.warning(f"LLM call throttled (attempt {attempt + 1}), retrying in {delay:.2f}s: {exc}")
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+
+    def metrics(self):
+        with self.metrics_lock:
+            metrics = dict(self.counters)
+        metrics["queue_depth"] = self.limiter.waiting
+        metrics["in_flight"] = self.limiter.in_flight
+        metrics["concurrency_limit"] = round(self.limiter.limit, 2)
+        return metrics
+
+
+# Local stand-in for a chat model that injects throttling errors, for exercising the controller offline.
+class ThrottlingStandIn:
+    def __init__(self, capacity=3, throttle_rate=0.1, latency=0.2, response="{}"):
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.latency = latency
+        self.response = response
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, messages):
+        with self.lock:
+            self.active += 1
+            overloaded = self.active > self.capacity
+        try:
+            if overloaded or random.random() < self.throttle_rate:
+                raise ThrottlingError("ThrottlingException: Too many requests, please wait before trying again.")
+            time.sleep(random.expovariate(1 / self.latency) if self.latency else 0)
+            from types import SimpleNamespace
+            return SimpleNamespace(content=self.response, usage_metadata={})
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+# Function to return the process-wide controller, configured from the environment
+def get_controller():
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            hedge_after = os.environ.get("CA_LLM_HEDGE_AFTER")
+            _controller = LLMController(
+                max_concurrency=int(os.environ.get("CA_LLM_MAX_CONCURRENCY", "8")),
+                initial_concurrency=int(os.environ.get("CA_LLM_INITIAL_CONCURRENCY", "4")),
+                requests_per_second=float(os.environ.get("CA_LLM_REQUESTS_PER_SECOND", "5")),
+                burst=int(os.environ.get("CA_LLM_BURST", "10")),
+                max_retries=int(os.environ.get("CA_LLM_MAX_RETRIES", "6")),
+                hedge_after=float(hedge_after) if hedge_after else None,
+            )
+        return _controller
+
+
+if __name__ == "__main__":
+    # Drive the controller against the throttling stand-in and print its metrics
+    stand_in = ThrottlingStandIn(capacity=3, throttle_rate=0.1, latency=0.1)
+    controller = LLMController(max_concurrency=8, requests_per_second=50, burst=20, base_delay=0.05, max_delay=1.0, hedge_after=0.3)
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(lambda _: controller.call(lambda: stand_in.invoke([])), range(100)))
+    print(controller.metrics())
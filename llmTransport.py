@@ -0,0 +1,141 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from types import SimpleNamespace
+
+# record: replay known prompts and call the live model (saving the answer) for new ones;
+# replay: never call the live model, unknown prompts fail
+CASSETTE_MODE = os.environ.get("CA_LLM_CASSETTE", "off")
+CASSETTE_DIR = os.environ.get("CA_LLM_CASSETTE_DIR", os.path.join("Data", "cassettes"))
+# "recorded" sleeps for the latency seen at record time, a number sleeps that many seconds, 0 disables
+REPLAY_LATENCY = os.environ.get("CA_LLM_CASSETTE_LATENCY", "0")
+
+transport_logger = logging.getLogger("llm_transport")
+
+
+# Function to hash a model id and prompt so recorded responses can be looked up
+def prompt_hash(messages, model_id=""):
+    content = model_id + "\n" + "\n".join(str(message["content"]) for message in messages)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _replay_delay(recorded_latency, latency=None):
+    latency = REPLAY_LATENCY if latency is None else latency
+    if latency == "recorded":
+        return recorded_latency or 0.0
+    return float(latency)
+
+
+# Chat model stand-in that replays cassettes (one gzipped JSON file per prompt hash) and records new ones
+class CassetteLLM:
+    def __init__(self, cassette_dir, live_llm=None, model_id="", latency=None):
+        self.cassette_dir = cassette_dir
+        self.live_llm = live_llm
+        self.model_id = model_id
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.counters = {"replayed": 0, "recorded": 0}
+        os.makedirs(cassette_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cassette_dir, f"{key}.json.gz")
+
+    def _load(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                return json.load(file)
+        # Uncompressed responses recorded by earlier versions of the regression harness
+        legacy_path = os.path.join(self.cassette_dir, f"{key}.json")
+        if os.path.exists(legacy_path):
+            with open(legacy_path, encoding="utf-8") as file:
+                return json.load(file)
+        return None
+
+    def _replay(self, recorded):
+        delay = _replay_delay(recorded.get("latency"), self.latency)
+        if delay:
+            time.sleep(delay)
+        with self.lock:
+            self.counters["replayed"] += 1
+        return SimpleNamespace(
+            content=recorded["content"],
+            tool_calls=recorded.get("tool_calls") or [],
+            usage_metadata=recorded.get("usage_metadata") or {},
+        )
+
+    # Function to save a cassette; written then renamed so concurrent sessions never read a half-written one
+    def _save(self, key, cassette):
+        temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as file:
+            json.dump(cassette, file)
+        os.replace(temp_path, self._path(key))
+        with self.lock:
+            self.counters["recorded"] += 1
+        transport_logger.info(f"Recorded response {key[:12]} for {self.model_id}")
+
+    def invoke(self, messages):
+        key = prompt_hash(messages, self.model_id)
+        recorded = self._load(key)
+        if recorded is not None:
+            return self._replay(recorded)
+        if self.live_llm is None:
+            raise KeyError(f"No recorded response for prompt {key}; record it with CA_LLM_CASSETTE=record")
+
+        start_time = time.time()
+        ai_msg = self.live_llm.invoke(messages)
+        self._save(key, {
+            "model_id": self.model_id,
+            "prompt": messages,
+            "content": ai_msg.content,
+            "usage_metadata": dict(getattr(ai_msg, "usage_metadata", None) or {}),
+            "latency": round(time.time() - start_time, 3),
+        })
+        return ai_msg
+
+    # Function to mirror the live model's tool-calling runnable, so recording captures the requests production sends
+    def with_structured_output(self, schema, include_raw=True):
+        live_runnable = None
+        if self.live_llm is not None and hasattr(self.live_llm, "with_structured_output"):
+            live_runnable = self.live_llm.with_structured_output(schema, include_raw=True)
+        return StructuredCassette(self, schema, live_runnable)
+
+
+# Tool-calling counterpart of CassetteLLM: cassettes are keyed on the messages and the requested schema,
+# and hold the raw message, its tool calls and the parsed result
+class StructuredCassette:
+    def __init__(self, cassette, schema, live_runnable=None):
+        self.cassette = cassette
+        self.schema = schema
+        self.live_runnable = live_runnable
+        self.schema_key = json.dumps(schema.model_json_schema(), sort_keys=True)
+
+    def invoke(self, messages):
+        key = prompt_hash(messages, f"{self.cassette.model_id}\n{self.schema_key}")
+        recorded = self.cassette._load(key)
+        if recorded is not None:
+            raw = self.cassette._replay(recorded)
+            parsed = None if recorded.get("parsed") is None else self.schema.model_validate(recorded["parsed"])
+            return {"raw": raw, "parsed": parsed, "parsing_error": None}
+        if self.live_runnable is None:
+            # Plain-text cassettes (recorded before tool calling, or from models without it) are parsed by the caller
+            return {"raw": self.cassette.invoke(messages), "parsed": None, "parsing_error": None}
+
+        start_time = time.time()
+        result = self.live_runnable.invoke(messages)
+        raw = result["raw"]
+        self.cassette._save(key, {
+            "model_id": self.cassette.model_id,
+            "schema": self.schema.__name__,
+            "prompt": messages,
+            "content": raw.content,
+            "tool_calls": [dict(tool_call) for tool_call in getattr(raw, "tool_calls", None) or []],
+            "parsed": None if result.get("parsed") is None else result["parsed"].model_dump(mode="json"),
+            "usage_metadata": dict(getattr(raw, "usage_metadata", None) or {}),
+            "latency": round(time.time() - start_time, 3),
+        })
+        return result
@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import resource
+import tempfile
+import threading
+from io import BytesIO
+from types import SimpleNamespace
+
+# Temporary directory holding every artefact of a run; created when the load test starts
+WORK_DIR = None
+
+FLOWS = ("upload", "extract", "chat")
+CHAT_QUESTIONS = [
+    "What is the redemption date for this notice?",
+    "Who is the paying agent?",
+    "Summarise the key terms of the call.",
+    "What is the record date?",
+    "Is the redemption conditional?",
+]
+
+
+# Local stand-in for Bedrock: answers each prompt type with plausible output after a random latency
+class LoadTestLLM:
+    def __init__(self, model_id, latency=0.5):
+        self.model_id = model_id
+        self.latency = latency
+
+    def invoke(self, messages):
+        import re
+        prompt = messages[0]["content"]
+        time.sleep(random.uniform(0.5, 1.5) * self.latency if self.latency else 0)
+        if "Classify each corporate action" in prompt:
+            names = dict.fromkeys(re.findall(r'"([^"\n]+?\.pdf)"\s*:', prompt))
+            content = json.dumps({"documents": [{
+                "file_name": name,
+                "document_type": "Merger" if "merger" in name.lower() else "Full Call",
+                "issuer": "Load Test Issuer",
+                "confidence_score": 90,
+                "justification": "stand-in",
+            } for name in names]})
+        elif "Extract" in prompt or "extract" in prompt:
+            content = json.dumps({"IssuerName": "Load Test Issuer", "CUSIP": "123456AB7", "AcquiringCompany": "Load Test Acquirer"})
+        else:
+            content = "This is a stand-in answer for load testing."
+        return SimpleNamespace(content=content, usage_metadata={"input_tokens": len(prompt) // 4, "output_tokens": len(content) // 4})
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def rss_mb():
+    # Current resident set size on Linux; peak RSS elsewhere
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Function to empty the process-wide caches so every session count starts cold
+def reset_caches():
+    import sharedCache
+    from answerCache import get_answer_cache
+    for cache in (sharedCache.parsed_text_cache, sharedCache.extraction_cache, sharedCache.classification_cache):
+        with cache.lock:
+            cache.entries.clear()
+    answer_cache = get_answer_cache()
+    with answer_cache.lock:
+        answer_cache.entries.clear()
+        answer_cache.buckets.clear()
+
+
+# Upload as the browser hands it to the app: a file object with the uploader's name, type and file id
+class SimulatedUpload(BytesIO):
+    def __init__(self, data, name, file_id):
+        super().__init__(data)
+        self.name = name
+        self.type = "application/pdf"
+        self.file_id = file_id
+
+
+# One simulated operator with its own session state: upload a batch through the app's upload pipeline
+# (governor admission included), open each supported document, then ask the chat a question
+def run_session(session_number, documents, iterations, unique_uploads, timings, errors):
+    from attributes import EVENT_MODULES
+    from bulkEmail import extract_document
+    from chat import answer_question
+    from chatMemory import ConversationMemory
+    from uploadPipeline import process_uploads, save_classified
+    from usageStore import usage_context
+
+    session_id = f"loadtest-{session_number}"
+    session_state = {"upload_keys": {}, "chat_memory": ConversationMemory()}
+    folder = os.path.join(WORK_DIR, f"session_{session_number}", "Classified_PDFs")
+    on_error = lambda name, e: errors.append(f"{session_id} {name}: {e}")
+    with usage_context(session=session_id):
+        for iteration in range(iterations):
+            try:
+                # Each round is a new upload; unique uploads also get new bytes, so every round is read, classified and admitted again
+                uploads = [
+                    SimulatedUpload(data + (f"\n% {session_id} {iteration}\n".encode() if unique_uploads else b""), name, f"{session_id}-{iteration}-{name}")
+                    for name, data in documents
+                ]
+                start_time = time.time()
+                result, pdf_files, _ = process_uploads(uploads, session_id, session_state["upload_keys"], on_error)
+                timings["upload"].append(time.time() - start_time)
+                if result:
+                    save_classified(result["documents"], pdf_files, folder)
+                    for document in result["documents"]:
+                        if document["document_type"] not in EVENT_MODULES:
+                            continue
+                        start_time = time.time()
+                        extract_document(document, folder)
+                        timings["extract"].append(time.time() - start_time)
+
+                question = CHAT_QUESTIONS[(session_number + iteration) % len(CHAT_QUESTIONS)]
+                start_time = time.time()
+                # The operator researches the first document of the batch, as if its row were selected
+                answer_question(session_state["chat_memory"], question, session_id, next(iter(pdf_files.values()), ""))
+                session_state["chat_memory"].compact()
+                timings["chat"].append(time.time() - start_time)
+            except Exception as e:
+                errors.append(f"{session_id}: {e}")
+
+
+# Function to run `sessions` concurrent sessions and measure throughput, latency, CPU and memory
+def run_level(sessions, documents, iterations, unique_uploads=True):
+    from resourceGovernor import get_governor
+    reset_caches()
+    timings = {flow: [] for flow in FLOWS}
+    errors = []
+    # Sessions start from different documents, as operators on a floor would
+    threads = [
+        threading.Thread(target=run_session, args=(number, documents[number % len(documents):] + documents[:number % len(documents)], iterations, unique_uploads, timings, errors))
+        for number in range(sessions)
+    ]
+    governor_before = get_governor().metrics()
+    rss_before, cpu_before, start_time = rss_mb(), cpu_seconds(), time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.time() - start_time
+    cpu_used = cpu_seconds() - cpu_before
+    rss_after = rss_mb()
+    governor_after = get_governor().metrics()
+
+    report = {
+        "sessions": sessions,
+        "wall_seconds": round(wall_seconds, 2),
+        "session_iterations_per_second": round(sessions * iterations / wall_seconds, 3),
+        "cpu_percent": round(100 * cpu_used / wall_seconds, 1),
+        "cpu_seconds_per_session": round(cpu_used / sessions, 3),
+        "rss_mb": round(rss_after, 1),
+        "rss_growth_mb_per_session": round((rss_after - rss_before) / sessions, 2),
+        "errors": len(errors),
+        # How often the CA_MAX_JOBS / CA_MAX_USER_JOBS limits made an upload wait for a processing slot
+        "governor": {name: round(governor_after[name] - governor_before[name], 2) for name in ("admitted", "queued", "timed_out", "wait_seconds")},
+    }
+    for flow, values in timings.items():
+        report[flow] = {
+            "count": len(values),
+            "per_second": round(len(values) / wall_seconds, 3),
+            "p50": round(percentile(values, 0.50), 3),
+            "p95": round(percentile(values, 0.95), 3),
+            "p99": round(percentile(values, 0.99), 3),
+        }
+    for error in errors[:5]:
+        logging.error(error)
+    return report
+
+
+def print_report(reports):
+    header = f"{'sessions':>8} {'iter/s':>8} {'cpu%':>6} {'rss MB':>8}" + "".join(f" {flow + ' p50/p95':>18}" for flow in FLOWS) + f" {'queued':>6} {'wait s':>7} {'errors':>6}"
+    print(header)
+    for report in reports:
+        latencies = "".join(f" {report[flow]['p50']:>8.2f}/{report[flow]['p95']:<9.2f}" for flow in FLOWS)
+        print(f"{report['sessions']:>8} {report['session_iterations_per_second']:>8.2f} {report['cpu_percent']:>6.1f} {report['rss_mb']:>8.1f}{latencies} {report['governor']['queued']:>6} {report['governor']['wait_seconds']:>7.2f} {report['errors']:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated sessions through upload, extract and chat against a local LLM stand-in")
+    parser.add_argument("corpus", help="Directory of PDF notices to upload")
+    parser.add_argument("--sessions", default="1,2,4,8", help="Comma-separated session counts to test")
+    parser.add_argument("--iterations", type=int, default=3, help="Upload/extract/chat rounds per session")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Mean stand-in LLM latency in seconds")
+    parser.add_argument("--shared-uploads", action="store_true", help="Every session uploads the same documents, so later uploads are served from the shared caches")
+    parser.add_argument("--output", help="Write the reports as JSON to this file")
+    arguments = parser.parse_args()
+
+    documents = []
+    for name in sorted(os.listdir(arguments.corpus)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(arguments.corpus, name), "rb") as file:
+                documents.append((name, file.read()))
+    if not documents:
+        sys.exit(f"No PDFs found in {arguments.corpus}")
+
+    # Keep every artefact of a run (spool, results, usage, classified PDFs) out of the working tree;
+    # the app modules read these settings when imported, so they are set first
+    WORK_DIR = tempfile.mkdtemp(prefix="ca_loadtest_")
+    os.environ.setdefault("CA_RESULTS_DIR", os.path.join(WORK_DIR, "extractions"))
+    os.environ.setdefault("CA_DOCUMENT_SPOOL_DIR", os.path.join(WORK_DIR, "spool"))
+    os.environ.setdefault("CA_USAGE_DB", os.path.join(WORK_DIR, "usage.db"))
+
+    import llmClient
+    from usageStore import get_usage_store
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    llmClient.set_llm_factory(lambda model_id: LoadTestLLM(model_id, arguments.llm_latency))
+    # Every call is recorded in the usage store, as it is in the app
+    get_usage_store()
+
+    # Import the app modules up front so the first level does not pay for them
+    import importlib
+    from attributes import EVENT_MODULES
+    for module_name in set(EVENT_MODULES.values()):
+        importlib.import_module(module_name)
+
+    try:
+        reports = [run_level(int(sessions), documents, arguments.iterations, not arguments.shared_uploads) for sessions in arguments.sessions.split(",")]
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+    print_report(reports)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            json.dump(reports, file, indent=2)
@@ -1,14 +1,19 @@
 import os
-from PyPDF2 import PdfReader
 import json
 import streamlit as st
-import requests
-import re
 import pandas as pd
-from streamlit_pdf_viewer import pdf_viewer
 import base64
-import pyperclip
-from langchain_aws import ChatBedrock
+import modelRouter
+from tokenBudget import estimate_tokens, fit_to_budget
+from attributes import load_attributes
+from textNormaliser import PAGE_BREAK, normalise_text
+from resultStore import append_extraction
+from schemas import EVENT_SCHEMAS
+from sharedCache import shared_extract, shared_read_pdf
+from profiler import profiled
+from requery import requery_missing
+from usageStore import usage_context
+from chunkedExtraction import map_reduce_extract, should_chunk
 
 if 'copy_clicked' not in st.session_state:
     st.session_state.copy_clicked = False
@@ -23,11 +28,11 @@ if 'file_path' not in st.session_state:
 
 
 def read_pdf(file_path):
+    from PyPDF2 import PdfReader
     content = ""
     with open(file_path, 'rb') as file:
         reader = PdfReader(file)
-        for page in reader.pages:
-            content += page.extract_text()
+        content = PAGE_BREAK.join(page.extract_text() for page in reader.pages)
     return content
 
 def convert_pdfs_to_json(directory):
@@ -146,6 +151,25 @@ Note: Add extracted values only when found. Do not add anything on your own. Inc
     
     
 
+# Function to extract the event attributes from the document text
+def extract_attributes(pdf_data):
+    model_id = modelRouter.TIERS[modelRouter.initial_tier("merger_extraction")]
+    reserve_tokens = estimate_tokens(prompt(""), model_id)
+    # Page breaks are kept so long agreements are chunked on page and paragraph boundaries
+    pdf_data, _ = normalise_text(pdf_data, label="Merger", page_separator=PAGE_BREAK)
+    # Long agreements are extracted section by section in parallel instead of truncated into one prompt
+    if should_chunk(pdf_data, model_id, reserve_tokens):
+        return map_reduce_extract(pdf_data, prompt, EVENT_SCHEMAS["Merger"], "merger_chunk", "Merger extraction", model_id)
+    pdf_data = fit_to_budget(pdf_data.replace(PAGE_BREAK, "\n"), model_id, reserve_tokens, label="Merger")
+    extractionPrompt = prompt(pdf_data)
+    print("this is the prompt of merger",extractionPrompt)
+    attributes = modelRouter.invoke(
+        extractionPrompt, "merger_extraction", label="Merger extraction",
+        should_escalate=modelRouter.extraction_escalation("Merger"),
+        schema=EVENT_SCHEMAS["Merger"]
+    )
+    return attributes.as_dict()
+
 def generate_email(issuer_name, security_details, event_type, missing_data):
     missing_data_list = "\n- ".join(missing_data)
     email_template = f"""
@@ -191,6 +215,7 @@ if 'email_type' not in st.session_state:
 if 'email_content' not in st.session_state:
     st.session_state.email_content = ""
 
+@profiled("merger_show")
 def show(fileName):
     st.subheader("3. Merger Processing")
     folder_path = os.path.join("Classified_PDFs", "Merger")
@@ -205,33 +230,23 @@ def show(fileName):
         #     st.error(f"The file {fileName} is not available.")
         
         # Convert PDFs to JSON
-        pdf_data = read_pdf(st.session_state.file_path)
+        # Sessions opening the same document share one PDF read and one LLM extraction
+        pdf_data = shared_read_pdf(st.session_state.file_path, read_pdf)
         
         # Display JSON data
         if pdf_data:
-            fullCallPrompt = prompt(pdf_data)
-            print("this is the prompt of merger",fullCallPrompt)
-            llm = ChatBedrock(
-            model_id="anthropic.claude-3-5-sonnet-20241022-v2:0",
-            model_kwargs=dict(temperature=0),
-            )
-            messages =[{
-                "role": "user",
-                "content": f"""{fullCallPrompt}"""   
-        }
-            ] 
-            ai_msg = llm.invoke(messages)
-            json_part = re.search(r'\{.*\}', ai_msg.content, re.DOTALL).group()
-        
-       
-            # Parse the extracted JSON string
-            documents_data = json.loads(json_part)
+            with usage_context(document=fileName):
+                documents_data = shared_extract("Merger", pdf_data, extract_attributes)
             # st.json(documents_data)
             finalData =  pd.read_json(json.dumps(documents_data), orient='index')
             
             # Convert JSON to DataFrame
             finalData = pd.DataFrame(list(documents_data.items()), columns=['Attribute Name', 'Extracted Value'])
             st.session_state.response_merger = finalData
+            # Append this extraction to the Parquet result store once per document
+            if st.session_state.get('stored_extraction') != st.session_state.file_path:
+                append_extraction(fileName, "Merger", documents_data)
+                st.session_state.stored_extraction = st.session_state.file_path
             # Divide the layout into two columns
             container_pdf, container_chat = st.columns([2, 1])
 
@@ -250,7 +265,7 @@ def show(fileName):
             with container_chat:
                 file_path = os.path.join(os.getcwd(), "Data", "meregrAttribute.csv")
                 if os.path.exists(file_path):
-                    full_call_attributes = pd.read_csv(file_path)
+                    full_call_attributes = load_attributes("Merger")
                 else:
                     st.error(f"File not found: {file_path}")
                 # Convert to lower case and remove special characters
@@ -263,6 +278,15 @@ def show(fileName):
                 # Reset index and adjust to start from 1
                 st.session_state.edited_data_merger.reset_index(drop=True, inplace=True)
                 st.session_state.edited_data_merger.index += 1  # This changes the index to start at 1
+                # Second pass: re-query only the mandatory attributes still missing, over their most relevant pages
+                if st.button("Re-query Missing Fields"):
+                    with st.spinner("Re-querying missing fields..."), usage_context(document=fileName):
+                        st.session_state.edited_data_merger, recovered = requery_missing("Merger", pdf_data, st.session_state.edited_data_merger)
+                    if recovered:
+                        append_extraction(fileName, "Merger", st.session_state.edited_data_merger, source="requery")
+                        st.success(f"Recovered {len(recovered)} missing fields: {', '.join(recovered)}")
+                    else:
+                        st.info("No missing fields could be recovered")
                 # Create form for data editing
                 with st.form("data_editor_form"):
                     edited_df = st.data_editor(
@@ -281,6 +305,7 @@ def show(fileName):
                     
                     if submit_button:
                         st.session_state.edited_data = edited_df
+                        append_extraction(fileName, "Merger", edited_df, source="edited")
                         st.success("Changes saved successfully!")
                 
                 # st.dataframe(merged_df)
@@ -308,6 +333,7 @@ def show(fileName):
 
                 # Add a button to copy the text
                 if st.button('Copy '):
+                    import pyperclip
                     pyperclip.copy(base64_text)
                     st.success('Text copied successfully!')
 
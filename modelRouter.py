@@ -0,0 +1,145 @@
+import os
+import time
+import logging
+import threading
+from collections import deque, defaultdict
+import llmClient
+
+# Model behind each tier; the fast tier handles classification and simple extractions
+TIERS = {
+    "fast": os.environ.get("CA_FAST_MODEL_ID", "anthropic.claude-3-5-haiku-20241022-v1:0"),
+    "strong": os.environ.get("CA_STRONG_MODEL_ID", llmClient.DEFAULT_MODEL_ID),
+}
+
+# Starting tier per call purpose; CA_ROUTING=off sends everything to the strong tier
+ROUTES = {
+    "classification": "fast",
+    "extraction": "fast",
+    "merger_extraction": "strong",
+    "merger_chunk": "fast",
+    "chat": "strong",
+    "summary": "fast",
+    "requery": "fast",
+}
+ROUTING_ENABLED = os.environ.get("CA_ROUTING", "on") != "off"
+
+router_logger = logging.getLogger("model_router")
+
+_lock = threading.Lock()
+_decisions = deque(maxlen=500)
+_tier_stats = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "escalations": 0})
+
+
+# Function to pick the starting tier for a purpose
+def initial_tier(purpose):
+    if not ROUTING_ENABLED:
+        return "strong"
+    default = ROUTES.get(purpose, "strong")
+    tier = os.environ.get(f"CA_ROUTE_{purpose.upper()}", default)
+    if tier not in TIERS:
+        router_logger.warning(f"CA_ROUTE_{purpose.upper()}={tier} is not one of {', '.join(TIERS)}; using {default}")
+        return default
+    return tier
+
+
+def record_decision(purpose, label, tier, reason):
+    decision = {"time": time.time(), "purpose": purpose, "label": label, "tier": tier, "model_id": TIERS[tier], "reason": reason}
+    with _lock:
+        _decisions.append(decision)
+        if reason != "initial":
+            _tier_stats[tier]["escalations"] += 1
+    router_logger.info(f"{label}: routed to {tier} ({TIERS[tier]}) - {reason}")
+
+
+# Function to call the model for a tier and record the tier's latency
+def invoke_tier(prompt, tier, label, schema=None):
+    start_time = time.time()
+    if schema is not None:
+        ai_msg = llmClient.invoke_structured(prompt, schema, label=label, model_id=TIERS[tier])
+    else:
+        ai_msg = llmClient.invoke(prompt, label=label, model_id=TIERS[tier])
+    with _lock:
+        _tier_stats[tier]["calls"] += 1
+        _tier_stats[tier]["seconds"] += time.time() - start_time
+    return ai_msg
+
+
+# Function to send a prompt to its starting tier and escalate to the strong tier when `should_escalate` says so;
+# with a pydantic `schema` the validated model is returned instead of the AI message
+def invoke(prompt, purpose, label=None, tier=None, should_escalate=None, schema=None):
+    label = label or purpose
+    tier = tier or initial_tier(purpose)
+    record_decision(purpose, label, tier, "initial" if tier == initial_tier(purpose) else "requested")
+    try:
+        ai_msg = invoke_tier(prompt, tier, label, schema)
+    except ValueError as e:
+        # Output the fast tier could not produce in the schema even after repair
+        if tier == "strong":
+            raise
+        record_decision(purpose, label, "strong", str(e))
+        return invoke_tier(prompt, "strong", label, schema)
+    if tier != "strong" and should_escalate is not None:
+        reason = should_escalate(ai_msg)
+        if reason:
+            record_decision(purpose, label, "strong", reason)
+            ai_msg = invoke_tier(prompt, "strong", label, schema)
+    return ai_msg
+
+
+# Function to decide whether an extraction response should be re-run on the strong tier
+def extraction_escalation(event_type):
+    import json
+    from attributes import NOT_AVAILABLE, mandatory_attributes, normalise_attribute_name
+
+    def should_escalate(result):
+        if hasattr(result, "as_dict"):
+            extracted = result.as_dict()
+        else:
+            match = llmClient.JSON_PATTERN.search(result.content)
+            if not match:
+                return "no JSON in response"
+            try:
+                extracted = json.loads(match.group())
+            except ValueError:
+                return "unparseable JSON in response"
+        values = {normalise_attribute_name(name): value for name, value in extracted.items()}
+        try:
+            required = mandatory_attributes(event_type)
+        except (OSError, KeyError):
+            return None
+        missing = [name for name in required if str(values.get(name, NOT_AVAILABLE)).strip() in ("", NOT_AVAILABLE, "Not Avilable")]
+        return f"missing required fields: {', '.join(missing)}" if missing else None
+
+    return should_escalate
+
+
+def router_metrics():
+    with _lock:
+        tiers = {
+            tier: {
+                "calls": stats["calls"],
+                "escalations_to": stats["escalations"],
+                "avg_seconds": round(stats["seconds"] / stats["calls"], 2) if stats["calls"] else 0.0,
+            }
+            for tier, stats in _tier_stats.items()
+        }
+        return {"tiers": tiers, "recent_decisions": list(_decisions)[-20:]}
+
+
+if __name__ == "__main__":
+    # Exercise routing offline: the fast stand-in omits a field, so the call escalates
+    from types import SimpleNamespace
+
+    class StandInModel:
+        def __init__(self, model_id):
+            self.model_id = model_id
+
+        def invoke(self, messages):
+            if self.model_id == TIERS["fast"]:
+                return SimpleNamespace(content='{"IssuerName": "ACME", "CUSIP": "Not Available"}', usage_metadata={})
+            return SimpleNamespace(content='{"IssuerName": "ACME", "CUSIP": "123456AB7"}', usage_metadata={})
+
+    llmClient.set_llm_factory(StandInModel)
+    required = lambda ai_msg: "missing CUSIP" if "Not Available" in ai_msg.content else None
+    print(invoke("Extract the attributes", "extraction", label="demo", should_escalate=required).content)
+    print(router_metrics())
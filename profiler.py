@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import logging
+import threading
+import functools
+from collections import Counter
+
+# off: no overhead; sampling: stack samples of the request thread, cheap enough to leave on;
+# cprofile: deterministic profile plus samples, for investigating one slow request
+MODES = ("off", "sampling", "cprofile")
+DEFAULT_MODE = os.environ.get("CA_PROFILE", "off")
+PROFILE_DIR = os.environ.get("CA_PROFILE_DIR", "Profiles")
+# Oldest profile files beyond this count are removed
+MAX_PROFILE_FILES = int(os.environ.get("CA_PROFILE_KEEP", "200"))
+SAMPLE_INTERVAL = float(os.environ.get("CA_PROFILE_INTERVAL", "0.01"))
+
+profile_logger = logging.getLogger("profiler")
+_local = threading.local()
+_rotate_lock = threading.Lock()
+
+
+# Function to choose the profiling mode for requests on the current thread (one Streamlit session)
+def set_mode(mode):
+    _local.mode = mode if mode in MODES else "off"
+
+
+def current_mode():
+    return getattr(_local, "mode", DEFAULT_MODE)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+# Samples one thread's stack at a fixed interval into folded "outer;inner count" lines
+class StackSampler:
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="ca-profiler", daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def _rotate(profile_dir):
+    with _rotate_lock:
+        files = sorted((os.path.join(profile_dir, name) for name in os.listdir(profile_dir)), key=os.path.getmtime)
+        for file_path in files[:max(len(files) - MAX_PROFILE_FILES, 0)]:
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+
+# Function to run fn under the current profiling mode and write <time>_<name>.folded (and .prof for cprofile)
+def run_profiled(name, fn, *args, **kwargs):
+    mode = current_mode()
+    # Nested hooks (process_files -> process_pdfs) are covered by the outermost profile
+    if mode == "off" or getattr(_local, "active", False):
+        return fn(*args, **kwargs)
+
+    _local.active = True
+    sampler = StackSampler(threading.get_ident())
+    profile = None
+    if mode == "cprofile":
+        import cProfile
+        profile = cProfile.Profile()
+    start_time = time.time()
+    sampler.start()
+    if profile is not None:
+        profile.enable()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        if profile is not None:
+            profile.disable()
+        sampler.stop()
+        _local.active = False
+        elapsed = time.time() - start_time
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            base_path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(start_time * 1000) % 1000:03d}_{name}")
+            with open(f"{base_path}.folded", "w", encoding="utf-8") as file:
+                file.write(sampler.folded())
+            if profile is not None:
+                profile.dump_stats(f"{base_path}.prof")
+            _rotate(PROFILE_DIR)
+            profile_logger.info(f"{name} took {elapsed:.2f}s ({mode}); profile written to {base_path}")
+        except OSError as e:
+            profile_logger.warning(f"Could not write profile for {name}: {e}")
+
+
+# Decorator form of run_profiled
+def profiled(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return run_profiled(name, fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+if __name__ == "__main__":
+    # Usage: python profiler.py <profile.prof> - print the top functions of a cProfile capture
+    import pstats
+    pstats.Stats(sys.argv[1]).sort_stats("cumulative").print_stats(30)
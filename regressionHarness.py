@@ -0,0 +1,180 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+from io import BytesIO
+from collections import defaultdict
+import llmClient
+from llmTransport import CassetteLLM
+from attributes import EVENT_MODULES, normalise_attribute_name
+
+# Corpus layout:
+#   <corpus>/labels.json    [{"file_name": "x.pdf", "document_type": "Full Call", "attributes": {"IssuerName": "..."}}]
+#   <corpus>/*.pdf          the labelled notices
+#   <corpus>/responses/     LLM cassettes keyed by prompt hash
+#   <corpus>/baseline.json  stored report to diff against
+LABELS_FILE = "labels.json"
+RESPONSES_DIR = "responses"
+BASELINE_FILE = "baseline.json"
+
+# Allowed drift before a metric counts as a regression
+ACCURACY_TOLERANCE = 0.02
+COST_TOLERANCE = 0.10
+
+
+def load_labels(corpus_dir):
+    with open(os.path.join(corpus_dir, LABELS_FILE), encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _normalise_value(value):
+    return " ".join(str(value).lower().split())
+
+
+def _ratio(numerator, denominator):
+    return round(numerator / denominator, 4) if denominator else 0.0
+
+
+# Function to compute per-class precision and recall of the classification
+def classification_metrics(labels, predictions):
+    classes = sorted({label["document_type"] for label in labels} | set(predictions.values()))
+    per_class = {}
+    for document_class in classes:
+        true_positive = sum(1 for label in labels if label["document_type"] == document_class and predictions.get(label["file_name"]) == document_class)
+        predicted = sum(1 for label in labels if predictions.get(label["file_name"]) == document_class)
+        support = sum(1 for label in labels if label["document_type"] == document_class)
+        per_class[document_class] = {
+            "precision": _ratio(true_positive, predicted),
+            "recall": _ratio(true_positive, support),
+            "support": support,
+        }
+    correct = sum(1 for label in labels if predictions.get(label["file_name"]) == label["document_type"])
+    return {"accuracy": _ratio(correct, len(labels)), "per_class": per_class}
+
+
+# Function to compute per-attribute exact-match rates of the extraction
+def extraction_metrics(labels, extractions):
+    matches = defaultdict(lambda: [0, 0])
+    for label in labels:
+        if not label.get("attributes") or label["file_name"] not in extractions:
+            continue
+        extracted = {normalise_attribute_name(name): value for name, value in extractions[label["file_name"]].items()}
+        for name, expected in label["attributes"].items():
+            key = f"{label['document_type']}.{normalise_attribute_name(name)}"
+            matches[key][1] += 1
+            if _normalise_value(extracted.get(normalise_attribute_name(name), "")) == _normalise_value(expected):
+                matches[key][0] += 1
+    total_matched = sum(matched for matched, _ in matches.values())
+    total = sum(count for _, count in matches.values())
+    return {
+        "exact_match": _ratio(total_matched, total),
+        "per_attribute": {key: _ratio(matched, count) for key, (matched, count) in sorted(matches.items())},
+    }
+
+
+# Function to run classification and extraction over the corpus and build the report
+def run_harness(corpus_dir, record=False):
+    labels = load_labels(corpus_dir)
+    def recorded_llm(model_id):
+        live_llm = llmClient.bedrock_llm(model_id) if record else None
+        # Replay without the recorded latency so timings measure the app, not Bedrock
+        return CassetteLLM(os.path.join(corpus_dir, RESPONSES_DIR), live_llm, model_id, latency=0)
+
+    llmClient.set_llm_factory(recorded_llm)
+
+    calls = []
+    llmClient.add_call_listener(calls.append)
+    try:
+        from classificationAgent import process_pdfs
+        files = {}
+        for label in labels:
+            with open(os.path.join(corpus_dir, label["file_name"]), "rb") as file:
+                files[label["file_name"]] = BytesIO(file.read())
+        start_time = time.time()
+        result = process_pdfs(files)
+        classification_seconds = time.time() - start_time
+        predictions = {document["file_name"]: document["document_type"] for document in result["documents"]}
+
+        # Extraction is scored against the labelled event type so a misclassification is only counted once
+        extractions = {}
+        extraction_seconds = []
+        for label in labels:
+            if not label.get("attributes") or label["document_type"] not in EVENT_MODULES:
+                continue
+            event_module = importlib.import_module(EVENT_MODULES[label["document_type"]])
+            start_time = time.time()
+            extractions[label["file_name"]] = event_module.extract_attributes(event_module.read_pdf(os.path.join(corpus_dir, label["file_name"])))
+            extraction_seconds.append(time.time() - start_time)
+    finally:
+        llmClient.remove_call_listener(calls.append)
+        llmClient.set_llm_factory(None)
+
+    input_tokens = sum(call["input_tokens"] or call["estimated_input_tokens"] for call in calls)
+    output_tokens = sum(call["output_tokens"] or 0 for call in calls)
+    return {
+        "documents": len(labels),
+        "classification": classification_metrics(labels, predictions),
+        "extraction": extraction_metrics(labels, extractions),
+        "cost": {
+            "llm_calls": len(calls),
+            "input_tokens_per_document": round(input_tokens / max(len(labels), 1), 1),
+            "output_tokens_per_document": round(output_tokens / max(len(labels), 1), 1),
+            "classification_seconds": round(classification_seconds, 3),
+            "extraction_seconds_per_document": round(sum(extraction_seconds) / max(len(extraction_seconds), 1), 3),
+        },
+    }
+
+
+def _flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+# Function to compare a report with the stored baseline; returns the regressed metrics
+def diff_reports(baseline, report):
+    regressions = []
+    base = _flatten(baseline)
+    for name, value in _flatten(report).items():
+        if name not in base or name.endswith("support") or name == "documents":
+            continue
+        old = base[name]
+        if name.startswith("cost."):
+            # Lower is better for tokens, calls and seconds
+            if old and value > old * (1 + COST_TOLERANCE):
+                regressions.append((name, old, value))
+        elif value < old - ACCURACY_TOLERANCE:
+            regressions.append((name, old, value))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Accuracy and latency regression harness for the CA prompts")
+    parser.add_argument("corpus", help="Directory holding labels.json, the PDFs and recorded responses")
+    parser.add_argument("--record", action="store_true", help="Call Bedrock for prompts with no recorded response and save them")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    arguments = parser.parse_args()
+
+    report = run_harness(arguments.corpus, record=arguments.record)
+    print(json.dumps(report, indent=2))
+
+    baseline_path = os.path.join(arguments.corpus, BASELINE_FILE)
+    if arguments.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as file:
+            regressions = diff_reports(json.load(file), report)
+        for name, old, new in regressions:
+            print(f"REGRESSION {name}: {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
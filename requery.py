@@ -0,0 +1,109 @@
+import os
+import re
+import math
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import modelRouter
+from attributes import NOT_AVAILABLE, mandatory_attributes, normalise_attribute_name
+from schemas import CALL_ATTRIBUTES, MERGER_ATTRIBUTES, AttributeValue
+from textNormaliser import PAGE_BREAK
+from usageStore import bind_usage_context
+
+# Pages sent with each re-query
+TOP_PAGES = int(os.environ.get("CA_REQUERY_PAGES", "2"))
+MAX_WORKERS = int(os.environ.get("CA_REQUERY_WORKERS", "4"))
+
+EVENT_LABELS = {"Full Call": CALL_ATTRIBUTES, "Partial Call": CALL_ATTRIBUTES, "Merger": MERGER_ATTRIBUTES}
+# Extra search terms for attributes whose label words rarely appear in the notice itself
+SEARCH_TERMS = {
+    "accruedinterestaccrueddividend": ["accrued", "interest", "dividend"],
+    "conditionalpaymentapplicableflag": ["contingent", "conditional", "payment"],
+    "contactemail": ["email", "contact", "@"],
+    "contactphonenumber": ["telephone", "phone", "call", "contact"],
+    "publicationdatedateddaterecorddate": ["dated", "record", "date", "notice"],
+    "premiumcashrate": ["premium", "make-whole", "rate"],
+    "trusteeagentpayingagent": ["trustee", "paying", "agent"],
+    "securitysymbol": ["ticker", "symbol", "nyse", "nasdaq"],
+    "outstandingnumberofsecurities": ["outstanding", "aggregate", "principal"],
+    "cusipisinricsedol": ["cusip", "isin", "sedol"],
+    "targetcompanyownershipdistributionposttransaction": ["own", "ownership", "stockholders", "percent"],
+    "combinedprimaryexchange": ["exchange", "listed", "nyse", "nasdaq"],
+    "votingrequired": ["vote", "approval", "stockholders"],
+}
+
+requery_logger = logging.getLogger("requery")
+_word_pattern = re.compile(r"[a-z0-9@]+")
+
+
+def _terms(label):
+    words = re.sub(r"([a-z])([A-Z])", r"\1 \2", label).lower()
+    terms = [word for word in _word_pattern.findall(words) if len(word) > 2 or word == "@"]
+    return terms + SEARCH_TERMS.get(normalise_attribute_name(label), [])
+
+
+# Function to rank the document's pages for an attribute with a small TF-IDF score
+def retrieve_pages(pdf_data, label, top_pages=TOP_PAGES):
+    pages = [page for page in pdf_data.split(PAGE_BREAK) if page.strip()]
+    if len(pages) <= top_pages:
+        return pages
+    page_words = [Counter(_word_pattern.findall(page.lower())) for page in pages]
+    scores = []
+    for number, words in enumerate(page_words):
+        score = 0.0
+        for term in _terms(label):
+            document_frequency = sum(1 for other in page_words if other[term])
+            if words[term]:
+                score += (1 + math.log(words[term])) * math.log(1 + len(pages) / document_frequency)
+        scores.append((score, -number))
+    best = sorted(range(len(pages)), key=lambda number: scores[number], reverse=True)[:top_pages]
+    # Keep the selected pages in document order
+    return [pages[number] for number in sorted(best)]
+
+
+def requery_prompt(event_type, label, excerpt):
+    return f"""The following pages come from a corporate action notice for a {event_type} event.
+Find the value of the attribute "{label}".
+Return it exactly as stated in the text. If it is not stated, return "{NOT_AVAILABLE}". Do not guess.
+
+Pages:
+{excerpt}"""
+
+
+# Function to re-query one attribute over its most relevant pages
+def requery_attribute(event_type, label, pdf_data):
+    excerpt = "\n\n".join(retrieve_pages(pdf_data, label))
+    result = modelRouter.invoke(requery_prompt(event_type, label, excerpt), "requery", label=f"{event_type} requery {label}", schema=AttributeValue)
+    return result.value
+
+
+# Function to fill the mandatory attributes still "Not Available" in an attribute table
+# ('Attribute Name' normalised, 'Extracted Value'); returns (updated table, {attribute name: recovered value})
+def requery_missing(event_type, pdf_data, attribute_table):
+    labels = {normalise_attribute_name(label): label for label in EVENT_LABELS[event_type]}
+    try:
+        required = set(mandatory_attributes(event_type))
+    except (OSError, KeyError):
+        required = set(labels)
+    missing = [
+        name for name, value in zip(attribute_table['Attribute Name'], attribute_table['Extracted Value'])
+        if name in required and name in labels and str(value).strip() in ("", NOT_AVAILABLE, "Not Avilable")
+    ]
+    if not missing:
+        return attribute_table, {}
+
+    def requery(name):
+        try:
+            return name, requery_attribute(event_type, labels[name], pdf_data)
+        except Exception as e:
+            requery_logger.warning(f"Re-query of {name} failed: {e}")
+            return name, NOT_AVAILABLE
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        recovered = {name: value for name, value in pool.map(bind_usage_context(requery), missing) if value != NOT_AVAILABLE}
+    requery_logger.info(f"{event_type}: re-queried {len(missing)} missing attributes, recovered {len(recovered)}")
+
+    attribute_table = attribute_table.copy()
+    for name, value in recovered.items():
+        attribute_table.loc[attribute_table['Attribute Name'] == name, 'Extracted Value'] = value
+    return attribute_table, recovered
@@ -0,0 +1,179 @@
+import os
+import time
+import zipfile
+import logging
+import threading
+from contextlib import contextmanager
+from collections import defaultdict
+
+# Per-upload limits, enforced while the data is read
+MAX_UPLOAD_BYTES = int(os.environ.get("CA_MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+MAX_FILE_BYTES = int(os.environ.get("CA_MAX_FILE_BYTES", str(50 * 1024 * 1024)))
+MAX_PAGES = int(os.environ.get("CA_MAX_PAGES", "500"))
+MAX_ZIP_ENTRIES = int(os.environ.get("CA_MAX_ZIP_ENTRIES", "1000"))
+MAX_COMPRESSION_RATIO = float(os.environ.get("CA_MAX_COMPRESSION_RATIO", "100"))
+# Per-user limits: decompressed bytes held by the user's running jobs, and concurrent jobs
+MAX_USER_BYTES = int(os.environ.get("CA_MAX_USER_BYTES", str(400 * 1024 * 1024)))
+MAX_USER_JOBS = int(os.environ.get("CA_MAX_USER_JOBS", "2"))
+# Server-wide concurrent jobs; further jobs wait up to ADMISSION_TIMEOUT seconds for a slot
+MAX_JOBS = int(os.environ.get("CA_MAX_JOBS", "4"))
+ADMISSION_TIMEOUT = float(os.environ.get("CA_ADMISSION_TIMEOUT", "120"))
+READ_CHUNK_BYTES = 1024 * 1024
+
+governor_logger = logging.getLogger("resource_governor")
+
+
+class ResourceLimitError(ValueError):
+    pass
+
+
+class AdmissionTimeout(ResourceLimitError):
+    pass
+
+
+# Function to reject a PDF with more pages than the limit before any page is extracted
+def check_page_count(reader, label="document"):
+    if len(reader.pages) > MAX_PAGES:
+        raise ResourceLimitError(f"{label} has {len(reader.pages)} pages; the limit is {MAX_PAGES}")
+
+
+# Function to open PDF bytes just far enough to enforce the page limit
+def check_pdf(data, label="document"):
+    from io import BytesIO
+    from PyPDF2 import PdfReader
+    check_page_count(PdfReader(BytesIO(data)), label)
+
+
+# Function to read a file object in chunks, stopping as soon as it exceeds max_bytes
+def read_limited(file, max_bytes, label="file", charge=None):
+    chunks, size = [], 0
+    while True:
+        chunk = file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise ResourceLimitError(f"{label} is larger than {max_bytes} bytes")
+        if charge is not None:
+            charge(len(chunk))
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+# Function to read the PDFs of a ZIP archive, enforcing entry count, per-file size, total
+# decompressed size and compression ratio while decompressing (archive headers can lie)
+def read_zip_pdfs(source, charge=None, label="archive"):
+    pdf_files = {}
+    total = [0]
+
+    def count(size):
+        total[0] += size
+        if total[0] > MAX_UPLOAD_BYTES:
+            raise ResourceLimitError(f"{label} decompresses to more than {MAX_UPLOAD_BYTES} bytes")
+        if charge is not None:
+            charge(size)
+
+    with zipfile.ZipFile(source, 'r') as zip_ref:
+        entries = [info for info in zip_ref.infolist() if info.filename.lower().endswith('.pdf')]
+        if len(entries) > MAX_ZIP_ENTRIES:
+            raise ResourceLimitError(f"{label} holds {len(entries)} PDFs; the limit is {MAX_ZIP_ENTRIES}")
+        for info in entries:
+            max_bytes, member_label = MAX_FILE_BYTES, f"{label}/{info.filename}"
+            if info.compress_size and info.compress_size * MAX_COMPRESSION_RATIO < max_bytes:
+                max_bytes = int(info.compress_size * MAX_COMPRESSION_RATIO)
+                member_label += f" (compression ratio above {MAX_COMPRESSION_RATIO:.0f})"
+            with zip_ref.open(info) as file:
+                pdf_files[info.filename] = read_limited(file, max_bytes, member_label, count)
+    return pdf_files
+
+
+# A running job's handle for charging the decompressed bytes it holds against its user
+class Job:
+    def __init__(self, governor, user):
+        self.governor = governor
+        self.user = user
+        self.bytes = 0
+
+    def charge(self, size):
+        self.governor._charge(self, size)
+
+
+# Admission control: bounds concurrent jobs server-wide and per user, queueing jobs (up to a timeout)
+# instead of rejecting them when capacity is briefly exhausted
+class ResourceGovernor:
+    def __init__(self, max_jobs=MAX_JOBS, max_user_jobs=MAX_USER_JOBS, max_user_bytes=MAX_USER_BYTES, admission_timeout=ADMISSION_TIMEOUT):
+        self.max_jobs = max_jobs
+        self.max_user_jobs = max_user_jobs
+        self.max_user_bytes = max_user_bytes
+        self.admission_timeout = admission_timeout
+        self.condition = threading.Condition()
+        self.running = 0
+        self.waiting = 0
+        self.user_jobs = defaultdict(int)
+        self.user_bytes = defaultdict(int)
+        self.counters = {"admitted": 0, "queued": 0, "timed_out": 0, "limit_errors": 0, "wait_seconds": 0.0}
+
+    def _has_capacity(self, user):
+        return self.running < self.max_jobs and self.user_jobs.get(user, 0) < self.max_user_jobs
+
+    @contextmanager
+    def admit(self, user="anonymous"):
+        start_time = time.time()
+        with self.condition:
+            if not self._has_capacity(user):
+                self.counters["queued"] += 1
+                self.waiting += 1
+                try:
+                    admitted = self.condition.wait_for(lambda: self._has_capacity(user), self.admission_timeout)
+                finally:
+                    self.waiting -= 1
+                if not admitted:
+                    self.counters["timed_out"] += 1
+                    raise AdmissionTimeout(f"Server busy: no processing slot within {self.admission_timeout:.0f} seconds")
+            self.running += 1
+            self.user_jobs[user] += 1
+            self.counters["admitted"] += 1
+            self.counters["wait_seconds"] += time.time() - start_time
+        job = Job(self, user)
+        try:
+            yield job
+        except ResourceLimitError:
+            with self.condition:
+                self.counters["limit_errors"] += 1
+            raise
+        finally:
+            with self.condition:
+                self.running -= 1
+                self.user_jobs[user] -= 1
+                self.user_bytes[user] -= job.bytes
+                if not self.user_jobs[user]:
+                    del self.user_jobs[user]
+                    del self.user_bytes[user]
+                self.condition.notify_all()
+
+    def _charge(self, job, size):
+        with self.condition:
+            if self.user_bytes[job.user] + size > self.max_user_bytes:
+                raise ResourceLimitError(f"Uploads in progress exceed the per-user limit of {self.max_user_bytes} bytes")
+            self.user_bytes[job.user] += size
+            job.bytes += size
+
+    def metrics(self):
+        with self.condition:
+            metrics = dict(self.counters, running=self.running, waiting=self.waiting, active_users=len(self.user_jobs))
+        metrics["wait_seconds"] = round(metrics["wait_seconds"], 2)
+        return metrics
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+# Function to return the resource governor shared by every session in this process
+def get_governor():
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ResourceGovernor()
+        return _governor
+
@@ -0,0 +1,136 @@
+import os
+import uuid
+import logging
+import threading
+from datetime import datetime, date
+from urllib.parse import quote
+
+RESULTS_DIR = os.environ.get("CA_RESULTS_DIR", os.path.join("Results", "extractions"))
+PARTITION_COLUMNS = ["event_type", "extraction_date"]
+
+store_logger = logging.getLogger("result_store")
+_write_lock = threading.Lock()
+
+
+# Fixed schema of the extraction dataset: one row per extracted attribute
+def result_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("extraction_id", pa.string()),
+        ("file_name", pa.string()),
+        ("event_type", pa.string()),
+        ("attribute_name", pa.string()),
+        ("attribute_type", pa.string()),
+        ("extracted_value", pa.string()),
+        ("source", pa.string()),
+        ("extracted_at", pa.timestamp("us")),
+        ("extraction_date", pa.string()),
+    ])
+
+
+# Function to turn an extraction (dict or DataFrame with 'Attribute Name'/'Extracted Value') into rows
+def _rows(attributes):
+    if isinstance(attributes, dict):
+        return [(name, None, value) for name, value in attributes.items()]
+    attribute_types = attributes['Attribute Type'] if 'Attribute Type' in attributes.columns else [None] * len(attributes)
+    return list(zip(attributes['Attribute Name'], attribute_types, attributes['Extracted Value']))
+
+
+# Function to append one document's extraction to the partitioned Parquet dataset
+def append_extraction(file_name, event_type, attributes, source="extracted", results_dir=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    results_dir = results_dir or RESULTS_DIR
+    extracted_at = datetime.now()
+    extraction_id = uuid.uuid4().hex
+    rows = _rows(attributes)
+    table = pa.table({
+        "extraction_id": [extraction_id] * len(rows),
+        "file_name": [file_name] * len(rows),
+        "event_type": [event_type] * len(rows),
+        "attribute_name": [str(name) for name, _, _ in rows],
+        "attribute_type": [None if attribute_type is None else str(attribute_type) for _, attribute_type, _ in rows],
+        "extracted_value": [None if value is None else str(value) for _, _, value in rows],
+        "source": [source] * len(rows),
+        "extracted_at": [extracted_at] * len(rows),
+        "extraction_date": [extracted_at.date().isoformat()] * len(rows),
+    }, schema=result_schema())
+    with _write_lock:
+        ds.write_dataset(
+            table,
+            results_dir,
+            format="parquet",
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor="hive",
+            basename_template=f"part-{extraction_id}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+    store_logger.info(f"Stored {len(rows)} {source} attributes for {file_name} ({event_type})")
+    return extraction_id
+
+
+def _dataset(results_dir=None):
+    import pyarrow.dataset as ds
+    return ds.dataset(results_dir or RESULTS_DIR, format="parquet", schema=result_schema(), partitioning="hive")
+
+
+# Function to load extraction results with a single columnar read, filtered on the partitions
+def load_results(event_type=None, start_date=None, end_date=None, columns=None, results_dir=None):
+    import pyarrow.dataset as ds
+    results_dir = results_dir or RESULTS_DIR
+    if not os.path.isdir(results_dir):
+        return result_schema().empty_table().to_pandas()
+    condition = None
+    filters = []
+    if event_type is not None:
+        filters.append(ds.field("event_type") == event_type)
+    if start_date is not None:
+        filters.append(ds.field("extraction_date") >= _iso(start_date))
+    if end_date is not None:
+        filters.append(ds.field("extraction_date") <= _iso(end_date))
+    for expression in filters:
+        condition = expression if condition is None else condition & expression
+    return _dataset(results_dir).to_table(columns=columns, filter=condition).to_pandas()
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+
+# Function to export results for downstream analytics as one Parquet or CSV file
+def export_results(output_path, event_type=None, start_date=None, end_date=None, results_dir=None):
+    results = load_results(event_type, start_date, end_date, results_dir=results_dir)
+    if output_path.endswith(".csv"):
+        results.to_csv(output_path, index=False)
+    else:
+        results.to_parquet(output_path, index=False)
+    return len(results)
+
+
+# Function to merge the small per-extraction files of one partition into a single file
+def compact_partition(event_type, extraction_date, results_dir=None):
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    results_dir = results_dir or RESULTS_DIR
+    # Partition values are URI-encoded by the hive writer ("Full Call" -> "Full%20Call")
+    partition_dir = os.path.join(results_dir, f"event_type={quote(event_type, safe='')}", f"extraction_date={_iso(extraction_date)}")
+    if not os.path.isdir(partition_dir):
+        return 0
+    with _write_lock:
+        files = [os.path.join(partition_dir, name) for name in os.listdir(partition_dir) if name.endswith(".parquet")]
+        if len(files) < 2:
+            return len(files)
+        table = ds.dataset(files, format="parquet").to_table()
+        compacted = os.path.join(partition_dir, f"compacted-{uuid.uuid4().hex}.parquet")
+        pq.write_table(table, compacted)
+        for file_path in files:
+            os.remove(file_path)
+    return len(files)
+
+
+if __name__ == "__main__":
+    import sys
+    # Usage: python resultStore.py <output.parquet|output.csv> [event type] [start date] [end date]
+    arguments = sys.argv[1:] + [None] * 3
+    count = export_results(arguments[0], arguments[1], arguments[2], arguments[3])
+    print(f"Exported {count} rows to {arguments[0]}")
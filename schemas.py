@@ -0,0 +1,108 @@
+import re
+from typing import List
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, create_model, field_validator
+
+NOT_AVAILABLE = "Not Available"
+DOCUMENT_TYPES = ("Merger", "Full Call", "Partial Call", "Unknown")
+
+# Attribute labels exactly as the event prompts and attribute lists name them
+CALL_ATTRIBUTES = [
+    "AccruedInterest / AccruedDividend", "BaseCusip", "Class", "ConditionalPaymentApplicableFlag",
+    "ContactE-mail", "ContactPhoneNumber", "Currency", "CUSIP", "CAEvent", "CAEventCategory",
+    "IssuerName", "SecuritySymbol", "Maturity", "OutstandingNumberOfSecurities", "Premium/ CashRate",
+    "Price", "PublicationDate / DatedDate / RecordDate", "Rate", "RedemptionAmount", "RedemptionDate",
+    "SubIssueType", "Trustee/Agent/PayingAgent",
+]
+MERGER_ATTRIBUTES = [
+    "CAEvent", "CASubEvent", "AcquiringCompany", "TargetCompany", "AnnouncementDate", "RecordDate",
+    "EffectiveDate", "PaymentDate", "ExchangeRatio", "CashAmount", "DealValue", "Additions / Premiums",
+    "TargetCompanyOwnershipDistributionPostTransaction", "CombinedPrimaryExchange", "VotingRequired",
+    "Currency", "CUSIP/ ISIN/ RIC/ SEDOL",
+]
+
+
+# Function to turn an attribute label into a field name the tool schema accepts
+def field_name(label):
+    return re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_')
+
+
+class ClassifiedDocument(BaseModel):
+    file_name: str
+    document_type: str
+    issuer: str = NOT_AVAILABLE
+    confidence_score: float = 0
+    justification: str = ""
+
+    @field_validator('document_type', mode='before')
+    @classmethod
+    def known_document_type(cls, value):
+        for document_type in DOCUMENT_TYPES:
+            if str(value).strip().lower() == document_type.lower():
+                return document_type
+        return "Unknown"
+
+    @field_validator('confidence_score', mode='before')
+    @classmethod
+    def percentage(cls, value):
+        return float(str(value).strip().rstrip('%') or 0)
+
+    @field_validator('issuer', 'justification', mode='before')
+    @classmethod
+    def text(cls, value):
+        return "" if value is None else str(value)
+
+
+class Classification(BaseModel):
+    documents: List[ClassifiedDocument]
+
+
+class EventAttributes(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    # Attribute values come back as strings, lists or nulls; the app works with strings
+    @field_validator('*', mode='before')
+    @classmethod
+    def as_text(cls, value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return NOT_AVAILABLE
+        if isinstance(value, (list, tuple)):
+            return ", ".join(str(item) for item in value) or NOT_AVAILABLE
+        return str(value)
+
+    # Function to return the attributes keyed by their original labels
+    def as_dict(self):
+        return self.model_dump(by_alias=True)
+
+
+def _attribute_model(model_name, labels):
+    fields = {
+        field_name(label): (str, Field(
+            default=NOT_AVAILABLE,
+            description=label,
+            validation_alias=AliasChoices(field_name(label), label),
+            serialization_alias=label,
+        ))
+        for label in labels
+    }
+    return create_model(model_name, __base__=EventAttributes, **fields)
+
+
+FullCallAttributes = _attribute_model("FullCallAttributes", CALL_ATTRIBUTES)
+PartialCallAttributes = _attribute_model("PartialCallAttributes", CALL_ATTRIBUTES)
+MergerAttributes = _attribute_model("MergerAttributes", MERGER_ATTRIBUTES)
+
+EVENT_SCHEMAS = {
+    "Full Call": FullCallAttributes,
+    "Partial Call": PartialCallAttributes,
+    "Merger": MergerAttributes,
+}
+
+
+# Answer of a single-attribute re-query
+class AttributeValue(BaseModel):
+    value: str = NOT_AVAILABLE
+
+    @field_validator('value', mode='before')
+    @classmethod
+    def as_text(cls, value):
+        return EventAttributes.as_text(value)
@@ -0,0 +1,170 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("CA_SHARED_CACHE_ENTRIES", "256"))
+TTL_SECONDS = float(os.environ.get("CA_SHARED_CACHE_TTL", str(24 * 3600)))
+
+
+# One in-progress computation that concurrent callers for the same key wait on
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Process-wide LRU cache with single-flight semantics: concurrent misses for one key run the computation once
+class SingleFlightCache:
+    def __init__(self, name, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "evictions": 0}
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] <= self.ttl_seconds:
+                self.entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1]
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = compute()
+        except Exception as e:
+            # Failures are shared with the waiters but never cached
+            flight.error = e
+            with self.lock:
+                self.counters["errors"] += 1
+            raise
+        else:
+            with self.lock:
+                self.entries[key] = (time.time(), flight.result)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.counters["evictions"] += 1
+            return flight.result
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+            flight.done.set()
+
+    # Function to look up a key without computing it; used where results are computed in batches
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl_seconds:
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return entry[1]
+
+    # Function to check for a live entry without counting it as a lookup
+    def contains(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and time.time() - entry[0] <= self.ttl_seconds
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+            metrics["entries"] = len(self.entries)
+            metrics["in_flight"] = len(self.flights)
+        lookups = metrics["hits"] + metrics["misses"] + metrics["coalesced"]
+        metrics["hit_rate"] = round((metrics["hits"] + metrics["coalesced"]) / lookups, 3) if lookups else 0.0
+        return metrics
+
+
+parsed_text_cache = SingleFlightCache("parsed_text")
+extraction_cache = SingleFlightCache("extraction")
+# Classification per document content, so a changed upload set only classifies the new documents
+classification_cache = SingleFlightCache("classification", max_entries=int(os.environ.get("CA_CLASSIFICATION_CACHE_ENTRIES", "4096")))
+
+
+# Function to identify a file by its content (its document store key), so copies and rewrites of one document share an entry
+def file_key(file_path):
+    from documentStore import content_key
+    return content_key(file_path)
+
+
+# Function to read a PDF once for every session asking for the same file
+def shared_read_pdf(file_path, read_pdf):
+    return parsed_text_cache.get_or_compute(file_key(file_path), lambda: read_pdf(file_path))
+
+
+# Function to keep page texts already read from some PDF bytes, so a later shared_read_pdf of them is a hit
+def remember_pdf_text(data, page_texts):
+    from textNormaliser import PAGE_BREAK
+    parsed_text_cache.put(hashlib.sha256(data).hexdigest(), PAGE_BREAK.join(page_texts))
+
+
+# Function to extract a document's attributes once for every session asking for the same text;
+# callers get their own copy so edits in one session do not leak into another
+def shared_extract(event_type, pdf_data, extract_attributes):
+    key = (event_type, hashlib.sha256(pdf_data.encode("utf-8")).hexdigest())
+    return dict(extraction_cache.get_or_compute(key, lambda: extract_attributes(pdf_data)))
+
+
+# Function to classify documents ({file name: document store key}), sending only content not seen before
+# to the classifier; returns {"documents": [...]} in input order
+def classify_cached(pdf_files):
+    classified_documents = {key: classification_cache.get(key) for key in set(pdf_files.values())}
+    new_files = {name: key for name, key in pdf_files.items() if classified_documents[key] is None}
+    if new_files:
+        from classificationAgent import process_pdfs
+        from documentStore import get_document_store
+        document_store = get_document_store()
+        logging.info(f"Classifying {len(new_files)} new of {len(pdf_files)} documents")
+        result = process_pdfs({name: document_store.open(key) for name, key in new_files.items()})
+        classified = {doc['file_name']: doc for doc in result['documents']}
+        for name, key in new_files.items():
+            if name in classified:
+                classified_documents[key] = classified[name]
+                classification_cache.put(key, classified[name])
+            elif classified_documents[key] is None:
+                # A document the classifier did not return is shown as Unknown for this call only,
+                # so the next rerun sends it again instead of every session seeing Unknown for a day
+                classified_documents[key] = {
+                    "file_name": name, "document_type": "Unknown", "issuer": "Not Available",
+                    "confidence_score": 0, "justification": "Not returned by the classifier",
+                }
+    return {"documents": [dict(classified_documents[key], file_name=name) for name, key in pdf_files.items()]}
+
+
+# Function to check whether every document key already has a cached classification
+def all_classified(keys):
+    return all(classification_cache.contains(key) for key in keys)
+
+
+def shared_cache_metrics():
+    return {cache.name: cache.metrics() for cache in (parsed_text_cache, extraction_cache, classification_cache)}
@@ -0,0 +1,125 @@
+import re
+import logging
+from collections import Counter
+from tokenBudget import estimate_tokens
+
+# Page separator used by the PDF readers so page boundaries survive until normalisation
+PAGE_BREAK = "\f"
+
+DEFAULT_RULES = {
+    # Keep only the first copy of a header/footer line seen on at least this share of pages
+    "repeat_page_ratio": 0.5,
+    "repeat_min_pages": 2,
+    # Lines at the top and bottom of each page considered as header/footer candidates
+    "edge_lines": 5,
+    # Drop lines whose share of letters is below this, unless they carry a date, amount or identifier
+    "min_alpha_ratio": 0.3,
+    "min_line_chars": 2,
+    "drop_patterns": [
+        r"^(page\s*)?[-–]?\s*\d+\s*[-–]?(\s*(of|/)\s*\d+)?$",
+        r"^this page (is )?intentionally left blank\.?$",
+        r"^(strictly )?(private and )?confidential$",
+    ],
+    "keep_patterns": [
+        r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}",
+        r"[$€£]\s?\d",
+        r"\d+(\.\d+)?\s?%",
+        r"\b[0-9A-Z]{9}\b",
+        r"\b[A-Z]{2}[0-9A-Z]{9}\d\b",
+    ],
+}
+
+normaliser_logger = logging.getLogger("text_normaliser")
+
+_compiled = {}
+
+
+def _patterns(patterns):
+    key = tuple(patterns)
+    if key not in _compiled:
+        _compiled[key] = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    return _compiled[key]
+
+
+PAGE_NUMBER_LINE = re.compile(r"^\W*(page\s*)?\d+(\s*(of|/)\s*\d+)?\W*$|\bpage\s*\d+(\s*(of|/)\s*\d+)?\b", re.IGNORECASE)
+
+
+# Function to key a line for repeat detection. Lines are compared verbatim, so per-series CUSIP, date and amount
+# lines stay distinct; only page-number lines ("Page 3 of 10", "Page 4 of 10") share a key
+def line_key(line):
+    line = line.lower()
+    if PAGE_NUMBER_LINE.search(line):
+        return re.sub(r"\d+", "#", line)
+    return line
+
+
+# Function to tidy whitespace within a line
+def collapse_whitespace(line):
+    return re.sub(r"\s+", " ", line).strip()
+
+
+# Function to normalise a document given as a list of page texts; returns the text and savings stats.
+# Pages are joined with page_separator (PAGE_BREAK keeps the boundaries for chunking)
+def normalise_pages(pages, rules=None, label="document", page_separator="\n"):
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    drop_patterns = _patterns(rules["drop_patterns"])
+    keep_patterns = _patterns(rules["keep_patterns"])
+
+    page_lines = [[collapse_whitespace(line) for line in page.split("\n")] for page in pages]
+
+    repeated = set()
+    if len(pages) >= rules["repeat_min_pages"]:
+        counts = Counter()
+        edge = rules["edge_lines"]
+        for lines in page_lines:
+            lines = [line for line in lines if line]
+            counts.update({line_key(line) for line in lines[:edge] + lines[-edge:]})
+        min_pages = max(rules["repeat_min_pages"], rules["repeat_page_ratio"] * len(pages))
+        repeated = {key for key, count in counts.items() if count >= min_pages}
+
+    dropped = Counter()
+    seen_repeated = set()
+    kept_pages = []
+    for lines in page_lines:
+        kept = []
+        for line in lines:
+            if len(line) < rules["min_line_chars"]:
+                if line:
+                    dropped["short"] += 1
+                continue
+            key = line_key(line)
+            # Dates, amounts and identifiers are kept on every page, since they may belong to different series
+            if key in repeated and not any(pattern.search(line) for pattern in keep_patterns):
+                if key in seen_repeated:
+                    dropped["repeated"] += 1
+                    continue
+                seen_repeated.add(key)
+            if any(pattern.search(line) for pattern in drop_patterns):
+                dropped["pattern"] += 1
+                continue
+            alpha_ratio = sum(ch.isalpha() for ch in line) / len(line)
+            if alpha_ratio < rules["min_alpha_ratio"] and not any(pattern.search(line) for pattern in keep_patterns):
+                dropped["low_information"] += 1
+                continue
+            kept.append(line)
+        kept_pages.append("\n".join(kept))
+
+    text = page_separator.join(page for page in kept_pages if page)
+    original = "\n".join(pages)
+    stats = {
+        "bytes_before": len(original.encode("utf-8")),
+        "bytes_after": len(text.encode("utf-8")),
+        "tokens_before": estimate_tokens(original),
+        "tokens_after": estimate_tokens(text),
+        "lines_dropped": dict(dropped),
+    }
+    normaliser_logger.info(
+        f"{label}: normalised {stats['bytes_before']} -> {stats['bytes_after']} bytes, "
+        f"~{stats['tokens_before']} -> ~{stats['tokens_after']} tokens, dropped {stats['lines_dropped']}"
+    )
+    return text, stats
+
+
+# Function to normalise a document whose pages are separated by PAGE_BREAK
+def normalise_text(text, rules=None, label="document", page_separator="\n"):
+    return normalise_pages(text.split(PAGE_BREAK), rules, label, page_separator)
@@ -0,0 +1,162 @@
+import os
+import re
+import json
+import logging
+import threading
+
+# Per-model context budgets (input tokens) and rough pricing/throughput figures
+# used to forecast a batch before it is submitted to Bedrock.
+MODEL_BUDGETS = {
+    "anthropic.claude-3-5-sonnet-20241022-v2:0": {
+        "max_input_tokens": 180000,
+        "max_output_tokens": 8192,
+        "input_cost_per_1k": 0.003,
+        "output_cost_per_1k": 0.015,
+        "output_tokens_per_second": 60,
+        "seconds_per_1k_input": 0.25,
+    },
+    "anthropic.claude-3-5-haiku-20241022-v1:0": {
+        "max_input_tokens": 180000,
+        "max_output_tokens": 8192,
+        "input_cost_per_1k": 0.0008,
+        "output_cost_per_1k": 0.004,
+        "output_tokens_per_second": 120,
+        "seconds_per_1k_input": 0.1,
+    },
+}
+DEFAULT_BUDGET = MODEL_BUDGETS["anthropic.claude-3-5-sonnet-20241022-v2:0"]
+
+# Share of the context window a single prompt may use; the rest is headroom for
+# the estimator's error and the response.
+BUDGET_FRACTION = float(os.environ.get("CA_TOKEN_BUDGET_FRACTION", "0.8"))
+CHARS_PER_TOKEN = 3.5
+EXPECTED_OUTPUT_TOKENS = 1500
+
+_calibration_lock = threading.Lock()
+_calibration = {}
+
+token_logger = logging.getLogger("token_budget")
+
+
+def get_budget(model_id):
+    return MODEL_BUDGETS.get(model_id, DEFAULT_BUDGET)
+
+
+# Function to estimate the token count of a text without calling the model
+def estimate_tokens(text, model_id=None):
+    if not text:
+        return 0
+    # Blend a character heuristic with a word count; numbers and punctuation
+    # heavy text tokenises worse than prose.
+    by_chars = len(text) / CHARS_PER_TOKEN
+    by_words = len(re.findall(r"\w+|[^\w\s]", text)) * 0.75
+    estimate = max(by_chars, by_words)
+    with _calibration_lock:
+        ratio = _calibration.get(model_id, 1.0)
+    return int(estimate * ratio) + 1
+
+
+# Function to return how many input tokens a prompt may use for a model
+def input_budget(model_id, reserve_tokens=0):
+    budget = get_budget(model_id)
+    return int(budget["max_input_tokens"] * BUDGET_FRACTION) - reserve_tokens
+
+
+# Function to drop low-information lines (page numbers, table debris) from text
+def prune_text(text):
+    lines = text.split('\n')
+    kept = [line for line in lines if len(line.strip()) > 0 and len(re.findall(r'[A-Za-z]', line)) / len(line) > 0.3]
+    return '\n'.join(kept)
+
+
+# Function to cut text to a token budget, keeping the head and tail of the document
+def truncate_text(text, max_tokens, model_id=None):
+    estimated = estimate_tokens(text, model_id)
+    if estimated <= max_tokens:
+        return text
+    # Scale by the observed chars-per-token of this text, with a little slack
+    max_chars = int(len(text) * max_tokens / estimated * 0.98)
+    head = text[:int(max_chars * 0.75)]
+    tail = text[-int(max_chars * 0.25):] if max_chars >= 4 else ""
+    return head + "\n...\n" + tail
+
+
+# Function to make a document fit within the budget: prune first, truncate if still too big
+def fit_to_budget(text, model_id, reserve_tokens=0, label="document"):
+    max_tokens = input_budget(model_id, reserve_tokens)
+    estimated = estimate_tokens(text, model_id)
+    if estimated <= max_tokens:
+        return text
+    pruned = prune_text(text)
+    pruned_estimate = estimate_tokens(pruned, model_id)
+    if pruned_estimate <= max_tokens:
+        token_logger.info(f"{label}: pruned from ~{estimated} to ~{pruned_estimate} tokens (budget {max_tokens})")
+        return pruned
+    truncated = truncate_text(pruned, max_tokens, model_id)
+    token_logger.warning(f"{label}: truncated from ~{estimated} to ~{estimate_tokens(truncated, model_id)} tokens (budget {max_tokens})")
+    return truncated
+
+
+# Function to split a {file_name: text} dict into batches that each fit the budget
+def split_to_budget(documents, model_id, reserve_tokens=0):
+    max_tokens = input_budget(model_id, reserve_tokens)
+    batches = []
+    current = {}
+    current_tokens = 0
+    for file_name, text in documents.items():
+        text = fit_to_budget(text, model_id, reserve_tokens, label=file_name)
+        tokens = estimate_tokens(json.dumps({file_name: text}), model_id)
+        if current and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current = {}
+            current_tokens = 0
+        current[file_name] = text
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+# Function to forecast tokens, cost and latency of a batch of prompts
+def forecast(prompts, model_id, expected_output_tokens=EXPECTED_OUTPUT_TOKENS):
+    budget = get_budget(model_id)
+    input_tokens = sum(estimate_tokens(p, model_id) for p in prompts)
+    output_tokens = expected_output_tokens * len(prompts)
+    cost = input_tokens / 1000 * budget["input_cost_per_1k"] + output_tokens / 1000 * budget["output_cost_per_1k"]
+    latency = input_tokens / 1000 * budget["seconds_per_1k_input"] + output_tokens / budget["output_tokens_per_second"]
+    return {
+        "model_id": model_id,
+        "calls": len(prompts),
+        "estimated_input_tokens": input_tokens,
+        "estimated_output_tokens": output_tokens,
+        "estimated_cost_usd": round(cost, 4),
+        "estimated_sequential_seconds": round(latency, 1),
+    }
+
+
+# Function to read the actual token usage reported on a langchain AI message
+def actual_usage(ai_msg):
+    usage = getattr(ai_msg, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens")
+    output_tokens = usage.get("output_tokens")
+    if input_tokens is None:
+        meta = (getattr(ai_msg, "response_metadata", None) or {}).get("usage", {})
+        input_tokens = meta.get("prompt_tokens", meta.get("input_tokens"))
+        output_tokens = meta.get("completion_tokens", meta.get("output_tokens"))
+    return input_tokens, output_tokens
+
+
+# Function to log estimated vs actual tokens and recalibrate the estimator
+def record_usage(label, model_id, estimated, ai_msg, elapsed):
+    input_tokens, output_tokens = actual_usage(ai_msg)
+    token_logger.info(
+        f"{label}: model={model_id} estimated_input={estimated} actual_input={input_tokens} "
+        f"actual_output={output_tokens} latency={elapsed:.2f}s"
+    )
+    if input_tokens and estimated:
+        with _calibration_lock:
+            ratio = _calibration.get(model_id, 1.0)
+            # Exponential moving average of actual/estimated, applied on top of the raw heuristic
+            raw = estimated / ratio
+            _calibration[model_id] = 0.8 * ratio + 0.2 * (input_tokens / raw)
+    return input_tokens, output_tokens
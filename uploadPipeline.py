@@ -0,0 +1,83 @@
+import os
+from documentStore import DocumentExpired, get_document_store
+from bundleSplitter import split_bundle
+from sharedCache import all_classified, classify_cached
+from resourceGovernor import MAX_FILE_BYTES, check_pdf, get_governor, read_limited, read_zip_pdfs
+
+
+# Function to put each upload into the shared document store once per session; returns {file name: document key}.
+# `upload_keys` is the session's {file id: [(name, key)]} memo; sizes, page counts and ZIP expansion are checked
+# while reading, and bytes are charged to the job's user. Files that fail are passed to on_error(name, error)
+def upload_documents(uploaded_files, job, upload_keys, on_error):
+    document_store = get_document_store()
+    pdf_files = {}
+
+    for uploaded_file in uploaded_files:
+        if uploaded_file.file_id not in upload_keys:
+            documents = []
+            try:
+                if uploaded_file.type == "application/x-zip-compressed":
+                    contents = read_zip_pdfs(uploaded_file, job.charge, uploaded_file.name)
+                elif uploaded_file.type == "application/pdf":
+                    uploaded_file.seek(0)
+                    contents = {uploaded_file.name: read_limited(uploaded_file, MAX_FILE_BYTES, uploaded_file.name, job.charge)}
+                else:
+                    contents = {}
+                for name, data in contents.items():
+                    check_pdf(data, name)
+                    # A bundle of several notices becomes one document (and one table row) per notice
+                    for segment_name, segment in split_bundle(data, name):
+                        documents.append((segment_name, document_store.put(segment)))
+            except Exception as e:
+                on_error(uploaded_file.name, e)
+                continue
+            upload_keys[uploaded_file.file_id] = documents
+        pdf_files.update(upload_keys[uploaded_file.file_id])
+    return pdf_files
+
+
+# Function to read and classify a session's uploads; returns (result, {file name: document key}, document count).
+# Only documents whose content has not been classified before go to the classifier;
+# the rest of the result set comes from the shared classification cache
+def process_uploads(uploaded_files, session_id, upload_keys, on_error):
+    forget_expired(upload_keys)
+    # Reruns over uploads that are already read and classified do no work, so they skip admission
+    if all(uploaded_file.file_id in upload_keys for uploaded_file in uploaded_files):
+        pdf_files = {name: key for uploaded_file in uploaded_files for name, key in upload_keys[uploaded_file.file_id]}
+        if not pdf_files:
+            return None, {}, 0
+        if all_classified(pdf_files.values()):
+            return classify_cached(pdf_files), pdf_files, len(pdf_files)
+    # Each browser session counts as one user; jobs beyond the limits wait for a slot
+    with get_governor().admit(session_id) as job:
+        pdf_files = upload_documents(uploaded_files, job, upload_keys, on_error)
+        if not pdf_files:
+            return None, {}, 0
+        return classify_cached(pdf_files), pdf_files, len(pdf_files)
+
+
+# Function to drop uploads whose documents have left the document store from a session's memo,
+# so the next read takes their bytes from the uploader again
+def forget_expired(upload_keys):
+    document_store = get_document_store()
+    for file_id, documents in list(upload_keys.items()):
+        if not all(document_store.contains(key) for _, key in documents):
+            del upload_keys[file_id]
+
+
+# Function to file each classified document under <folder>/<document type>/ for the extraction pages;
+# returns the names of documents that expired from the store and need to be uploaded again
+def save_classified(documents, pdf_files, folder="Classified_PDFs", upload_keys=None):
+    document_store = get_document_store()
+    expired = []
+    for doc in documents:
+        if doc['file_name'] in pdf_files:
+            category_folder = os.path.join(folder, doc['document_type'])
+            os.makedirs(category_folder, exist_ok=True)
+            try:
+                document_store.write_to(pdf_files[doc['file_name']], os.path.join(category_folder, doc['file_name']))
+            except DocumentExpired:
+                expired.append(doc['file_name'])
+    if expired and upload_keys is not None:
+        forget_expired(upload_keys)
+    return expired
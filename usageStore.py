@@ -0,0 +1,169 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from tokenBudget import get_budget
+
+USAGE_DB = os.environ.get("CA_USAGE_DB", os.path.join("Results", "usage.db"))
+ROLLUPS = ("document", "session_id", "day", "label", "model_id")
+
+usage_logger = logging.getLogger("usage_store")
+
+# Session and document the current LLM calls are made for
+_session = contextvars.ContextVar("usage_session", default="")
+_document = contextvars.ContextVar("usage_document", default="")
+
+
+# Function to attribute the LLM calls made inside the block to a session and/or document;
+# document may also map several documents to weights that the calls' usage is split by
+@contextmanager
+def usage_context(session=None, document=None):
+    tokens = []
+    if session is not None:
+        tokens.append((_session, _session.set(session)))
+    if document is not None:
+        tokens.append((_document, _document.set(document)))
+    try:
+        yield
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+
+def set_session(session):
+    _session.set(session)
+
+
+# Function to carry the caller's session and document into a worker thread
+def bind_usage_context(fn):
+    session, document = _session.get(), _document.get()
+
+    def run(*args, **kwargs):
+        with usage_context(session, document):
+            return fn(*args, **kwargs)
+    return run
+
+
+# Function to split a token count across weights, keeping the parts summing to the total
+def _split(total, weights):
+    parts, assigned, remaining = [], 0, sum(weights)
+    for weight in weights:
+        part = round((total - assigned) * weight / remaining) if remaining else 0
+        parts.append(part)
+        assigned += part
+        remaining -= weight
+    return parts
+
+
+def call_cost(model_id, input_tokens, output_tokens):
+    budget = get_budget(model_id)
+    return (input_tokens or 0) / 1000 * budget["input_cost_per_1k"] + (output_tokens or 0) / 1000 * budget["output_cost_per_1k"]
+
+
+# Local SQLite store with one row per LLM call
+class UsageStore:
+    def __init__(self, path=USAGE_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS llm_calls (
+                called_at REAL, day TEXT, session_id TEXT, document TEXT, label TEXT, model_id TEXT,
+                input_tokens INTEGER, output_tokens INTEGER, estimated INTEGER, latency REAL, cost REAL, share REAL DEFAULT 1)""")
+            # Stores created before calls were split across documents lack the share column
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(llm_calls)")]
+            if "share" not in columns:
+                self.connection.execute("ALTER TABLE llm_calls ADD COLUMN share REAL DEFAULT 1")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS llm_calls_day ON llm_calls (day)")
+
+    # Function to record one call; used as an llmClient call listener
+    def record(self, call):
+        input_tokens = call["input_tokens"]
+        estimated = input_tokens is None
+        if estimated:
+            # Models that report no usage are accounted with the pre-call estimate
+            input_tokens = call["estimated_input_tokens"]
+        now = time.time()
+        day = datetime.fromtimestamp(now).date().isoformat()
+        shares = _document.get()
+        if not isinstance(shares, dict) or not shares:
+            shares = {shares or "": 1}
+        # A call made for several documents is recorded as one row per document with its tokens split pro rata
+        weights = [max(weight, 0) or 1 for weight in shares.values()]
+        total_weight = sum(weights)
+        rows = [
+            (now, day, _session.get(), document, call["label"], call["model_id"], document_input, document_output,
+             int(estimated), call["latency"], call_cost(call["model_id"], document_input, document_output), weight / total_weight)
+            for document, weight, document_input, document_output in zip(
+                shares, weights, _split(input_tokens or 0, weights), _split(call["output_tokens"] or 0, weights))
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT INTO llm_calls VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _where(self, start_date=None, end_date=None, session_id=None):
+        clauses, parameters = [], []
+        if start_date is not None:
+            clauses.append("day >= ?")
+            parameters.append(str(start_date))
+        if end_date is not None:
+            clauses.append("day <= ?")
+            parameters.append(str(end_date))
+        if session_id is not None:
+            clauses.append("session_id = ?")
+            parameters.append(session_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), parameters
+
+    def calls(self, start_date=None, end_date=None, session_id=None):
+        import pandas as pd
+        where, parameters = self._where(start_date, end_date, session_id)
+        with self.lock:
+            return pd.read_sql_query(f"SELECT * FROM llm_calls{where} ORDER BY called_at", self.connection, params=parameters)
+
+    # Function to total calls, tokens, cost and latency by document, session, day, label or model
+    def rollup(self, by="document", start_date=None, end_date=None, session_id=None):
+        import pandas as pd
+        if by not in ROLLUPS:
+            raise ValueError(f"Unknown rollup {by}; expected one of {ROLLUPS}")
+        where, parameters = self._where(start_date, end_date, session_id)
+        query = f"""SELECT {by}, ROUND(SUM(share), 2) AS calls, SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens,
+            ROUND(SUM(cost), 4) AS cost, ROUND(SUM(latency * share), 2) AS latency_seconds, ROUND(MAX(latency), 2) AS max_latency_seconds
+            FROM llm_calls{where} GROUP BY {by} ORDER BY cost DESC"""
+        with self.lock:
+            return pd.read_sql_query(query, self.connection, params=parameters)
+
+    # Function to export raw calls (by=None) or a rollup as CSV or JSON, chosen by the file extension
+    def export(self, output_path, by=None, start_date=None, end_date=None):
+        table = self.calls(start_date, end_date) if by is None else self.rollup(by, start_date, end_date)
+        if output_path.endswith(".json"):
+            table.to_json(output_path, orient="records", indent=2)
+        else:
+            table.to_csv(output_path, index=False)
+        return len(table)
+
+
+_usage_store = None
+_usage_store_lock = threading.Lock()
+
+
+# Function to return the usage store, registering it once as an llmClient call listener
+def get_usage_store():
+    global _usage_store
+    with _usage_store_lock:
+        if _usage_store is None:
+            import llmClient
+            _usage_store = UsageStore()
+            llmClient.add_call_listener(_usage_store.record)
+        return _usage_store
+
+
+if __name__ == "__main__":
+    import sys
+    # Usage: python usageStore.py <output.csv|output.json> [document|session_id|day|label|model_id] [start date] [end date]
+    arguments = sys.argv[1:] + [None] * 3
+    count = get_usage_store().export(arguments[0], arguments[1], arguments[2], arguments[3])
+    print(f"Exported {count} rows to {arguments[0]}")
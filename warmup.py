@@ -0,0 +1,49 @@
+import logging
+import threading
+import time
+import importlib
+
+# Heavy third-party modules the first request would otherwise pay for
+WARM_MODULES = ["pandas", "PyPDF2", "langchain_aws", "boto3", "pydantic", "classificationAgent"]
+
+_started = False
+_started_lock = threading.Lock()
+
+warmup_logger = logging.getLogger("warmup")
+
+
+def _warm():
+    start_time = time.time()
+    for module_name in WARM_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            warmup_logger.warning(f"Warm-up import of {module_name} failed: {e}")
+
+    import llmClient
+    from attributes import ATTRIBUTE_FILES, load_attributes
+    from tokenBudget import estimate_tokens
+    try:
+        llmClient.get_llm()
+    except Exception as e:
+        warmup_logger.warning(f"Warm-up of LLM client failed: {e}")
+    for event_type in ATTRIBUTE_FILES:
+        try:
+            load_attributes(event_type)
+        except Exception as e:
+            warmup_logger.warning(f"Warm-up of {event_type} attributes failed: {e}")
+    # Touch the regexes so they are compiled and cached before the first document
+    llmClient.JSON_PATTERN.search("{}")
+    estimate_tokens("warm up")
+    warmup_logger.info(f"Warm-up finished in {time.time() - start_time:.2f} seconds")
+
+
+# Function to start the warm-up once per process in a background thread
+def start_warmup():
+    global _started
+    with _started_lock:
+        if _started:
+            return False
+        _started = True
+    threading.Thread(target=_warm, name="ca-warmup", daemon=True).start()
+    return True
@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import zipfile
+import threading
+from io import BytesIO
+from bundleSplitter import split_bundle
+from usageStore import get_usage_store, set_session
+from resourceGovernor import MAX_FILE_BYTES, check_pdf, read_limited, read_zip_pdfs
+
+INBOX_DIR = os.environ.get("CA_INBOX_DIR", "Inbox")
+CLASSIFIED_DIR = "Classified_PDFs"
+# A file must be quiet for this long, with an unchanged size, before it is picked up
+DEBOUNCE_SECONDS = float(os.environ.get("CA_INBOX_DEBOUNCE", "5"))
+POLL_SECONDS = 1.0
+# Quiet periods a stable file may stay incomplete (no %%EOF, broken ZIP) before it is moved to failed/
+INCOMPLETE_CHECKS = int(os.environ.get("CA_INBOX_INCOMPLETE_CHECKS", "3"))
+SUPPORTED_EXTENSIONS = (".pdf", ".zip")
+
+watch_logger = logging.getLogger("watch_folder")
+
+
+def _supported(path):
+    name = os.path.basename(path)
+    return name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith(".")
+
+
+# Function to read the PDFs out of an inbox file: the PDF itself or every PDF in a ZIP
+# with the same size, page and decompression limits as uploads. ZIP members are named after the archive
+# ("notices_a.pdf" for a.pdf in notices.zip) so members of different archives cannot collide
+def read_inbox_file(path):
+    if path.lower().endswith(".zip"):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        pdf_files = {f"{stem}_{name.replace('/', '_')}": data for name, data in read_zip_pdfs(path, label=os.path.basename(path)).items()}
+    else:
+        with open(path, 'rb') as file:
+            pdf_files = {os.path.basename(path): read_limited(file, MAX_FILE_BYTES, os.path.basename(path))}
+    documents = {}
+    for name, data in pdf_files.items():
+        check_pdf(data, name)
+        documents.update(split_bundle(data, name))
+    return documents
+
+
+# Function to check that a file has been written completely (a ZIP must have its central directory)
+def is_complete(path):
+    try:
+        if path.lower().endswith(".zip"):
+            return zipfile.is_zipfile(path)
+        with open(path, 'rb') as file:
+            file.seek(max(os.path.getsize(path) - 1024, 0))
+            return b"%%EOF" in file.read()
+    except OSError:
+        return False
+
+
+def _unique_name(name, taken):
+    stem, extension = os.path.splitext(name)
+    number = 2
+    while name in taken:
+        name = f"{stem}_{number}{extension}"
+        number += 1
+    return name
+
+
+# Function to classify a batch of PDFs, file them by event type and extract the supported ones;
+# also returns the names of documents that were not classified or whose extraction failed
+def process_batch(pdf_files):
+    from classificationAgent import process_pdfs
+    from bulkEmail import extract_all
+    from attributes import EVENT_MODULES
+    set_session("watch-folder")
+    result = process_pdfs({name: BytesIO(data) for name, data in pdf_files.items()})
+    documents = [document for document in result['documents'] if document['file_name'] in pdf_files]
+    for document in documents:
+        category_folder = os.path.join(CLASSIFIED_DIR, document['document_type'])
+        os.makedirs(category_folder, exist_ok=True)
+        with open(os.path.join(category_folder, document['file_name']), 'wb') as file:
+            file.write(pdf_files[document['file_name']])
+    # extract_all appends every extraction to the result store
+    extractions = extract_all(documents, CLASSIFIED_DIR)
+    classified = {document['file_name'] for document in documents}
+    extracted = {extraction['file_name'] for extraction in extractions}
+    failed = [name for name in pdf_files if name not in classified]
+    failed += [document['file_name'] for document in documents if document['document_type'] in EVENT_MODULES and document['file_name'] not in extracted]
+    watch_logger.info(f"Classified {len(documents)} and extracted {len(extractions)} documents from the inbox; {len(failed)} failed")
+    return documents, extractions, failed
+
+
+# Watches the inbox and processes files once they have stopped changing; handled files move to
+# processed/ or failed/ so nothing is picked up twice
+class InboxWatcher:
+    def __init__(self, inbox_dir=INBOX_DIR, debounce_seconds=DEBOUNCE_SECONDS):
+        self.inbox_dir = inbox_dir
+        self.debounce_seconds = debounce_seconds
+        self.processed_dir = os.path.join(inbox_dir, "processed")
+        self.failed_dir = os.path.join(inbox_dir, "failed")
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.observer = None
+        for folder in (inbox_dir, self.processed_dir, self.failed_dir):
+            os.makedirs(folder, exist_ok=True)
+
+    # Function to note a file event; every new event restarts the file's quiet period
+    def touch(self, path):
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.inbox_dir) or not _supported(path):
+            return
+        with self.lock:
+            self.pending[path] = {"seen": time.time(), "size": None, "incomplete_checks": 0}
+
+    # Function to return the files that are ready, and the ones that stayed incomplete for too long
+    def _ready(self):
+        now = time.time()
+        ready, abandoned = [], []
+        with self.lock:
+            for path, state in list(self.pending.items()):
+                if not os.path.exists(path):
+                    del self.pending[path]
+                    continue
+                if now - state["seen"] < self.debounce_seconds:
+                    continue
+                size = os.path.getsize(path)
+                if size != state["size"]:
+                    # Still growing (or first check): wait one more quiet period
+                    state["size"], state["seen"] = size, now
+                    continue
+                if is_complete(path):
+                    ready.append(path)
+                    del self.pending[path]
+                    continue
+                # Stable but incomplete: check again after another quiet period, then give up
+                state["incomplete_checks"] += 1
+                state["seen"] = now
+                if state["incomplete_checks"] >= INCOMPLETE_CHECKS:
+                    abandoned.append(path)
+                    del self.pending[path]
+        return ready, abandoned
+
+    def _move(self, path, folder):
+        target = os.path.join(folder, os.path.basename(path))
+        if os.path.exists(target):
+            stem, extension = os.path.splitext(os.path.basename(path))
+            target = os.path.join(folder, f"{stem}_{int(time.time())}{extension}")
+        shutil.move(path, target)
+
+    # Function to process every inbox file that is ready, as one classification batch
+    def process_ready(self):
+        ready, abandoned = self._ready()
+        for path in abandoned:
+            watch_logger.error(f"{path} stopped changing but is not a complete PDF or ZIP; moving it to failed")
+            self._move(path, self.failed_dir)
+        if not ready:
+            return 0
+        pdf_files, sources = {}, {}
+        for path in list(ready):
+            try:
+                for name, data in read_inbox_file(path).items():
+                    name = _unique_name(name, pdf_files)
+                    pdf_files[name] = data
+                    sources[name] = path
+            except Exception as e:
+                watch_logger.error(f"Could not read {path}: {e}")
+                self._move(path, self.failed_dir)
+                ready.remove(path)
+        failed_sources = set()
+        if pdf_files:
+            try:
+                _, _, failed = process_batch(pdf_files)
+            except Exception as e:
+                watch_logger.error(f"Processing of {len(ready)} inbox files failed: {e}")
+                for path in ready:
+                    self._move(path, self.failed_dir)
+                return 0
+            # A file any of whose documents failed goes to failed/ so it can be retried
+            failed_sources = {sources[name] for name in failed}
+            for name in failed:
+                watch_logger.error(f"{name} from {sources[name]} was not classified or extracted")
+        for path in ready:
+            self._move(path, self.failed_dir if path in failed_sources else self.processed_dir)
+        return len(ready)
+
+    def start(self):
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+
+        watcher = self
+
+        class InboxHandler(FileSystemEventHandler):
+            def on_created(self, event):
+                if not event.is_directory:
+                    watcher.touch(event.src_path)
+
+            def on_modified(self, event):
+                if not event.is_directory:
+                    watcher.touch(event.src_path)
+
+            def on_moved(self, event):
+                if not event.is_directory:
+                    watcher.touch(event.dest_path)
+
+        # Files dropped while the daemon was down are picked up too
+        for name in os.listdir(self.inbox_dir):
+            self.touch(os.path.join(self.inbox_dir, name))
+        self.observer = Observer()
+        self.observer.schedule(InboxHandler(), self.inbox_dir, recursive=False)
+        self.observer.start()
+        watch_logger.info(f"Watching {os.path.abspath(self.inbox_dir)} for PDF and ZIP files")
+
+    def run(self):
+        get_usage_store()
+        self.start()
+        try:
+            while not self.stopped.is_set():
+                self.process_ready()
+                self.stopped.wait(POLL_SECONDS)
+        finally:
+            self.observer.stop()
+            self.observer.join()
+
+    def stop(self):
+        self.stopped.set()
+
+
+if __name__ == "__main__":
+    # Usage: python watchFolder.py [inbox directory]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    watcher = InboxWatcher(sys.argv[1] if len(sys.argv) > 1 else INBOX_DIR)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()